@@ -1,6 +1,80 @@
+from django.conf import settings
 from django.contrib import admin
-from datahub.models import SnotelSite, SnotelData
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from datahub.models import (SnotelSite, SnotelData, IngestRun, ArchivedSeason, SnowGrid, AlertRule, SiteAlertState,
+                            AlertOutbox)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses PostgreSQL's row estimate instead of COUNT(*) for an unfiltered table.
+
+    The estimate (pg_class.reltuples, kept current by autovacuum) is only used once
+    it exceeds ADMIN_ESTIMATED_COUNT_THRESHOLD; smaller tables and filtered
+    changelists still get an exact count.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                               [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] > settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return row[0]
+        return super().count
+
+
+class SiteFilter(admin.SimpleListFilter):
+    title = 'site'
+    parameter_name = 'site'
+
+    def lookups(self, request, model_admin):
+        return SnotelSite.objects.order_by('name').values_list('site_id', 'name')
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(snotel_site_id=self.value())
+        return queryset
+
+
+@admin.register(SnotelData)
+class SnotelDataAdmin(admin.ModelAdmin):
+    list_display = ('snotel_site', 'timestamp', 'temp', 'snow_depth')
+    list_select_related = ('snotel_site',)
+    list_filter = (SiteFilter,)
+    date_hierarchy = 'timestamp'
+    ordering = ('-timestamp',)
+    raw_id_fields = ('snotel_site',)
+    paginator = EstimatedCountPaginator
+    # Skips the second, unfiltered COUNT(*) behind "N total".
+    show_full_result_count = False
+
+
+@admin.register(AlertRule)
+class AlertRuleAdmin(admin.ModelAdmin):
+    list_display = ('name', 'metric', 'comparison', 'threshold', 'snotel_site', 'enabled')
+    list_filter = ('metric', 'enabled')
+    raw_id_fields = ('snotel_site',)
+
+
+@admin.register(AlertOutbox)
+class AlertOutboxAdmin(admin.ModelAdmin):
+    list_display = ('rule', 'snotel_site', 'observed_at', 'value', 'status', 'attempts', 'delivered_at')
+    list_filter = ('status',)
+    list_select_related = ('rule', 'snotel_site')
+    raw_id_fields = ('rule', 'snotel_site')
+    ordering = ('-created_at',)
+
 
 # Register your models here.
 admin.site.register(SnotelSite)
-admin.site.register(SnotelData)
+admin.site.register(IngestRun)
+admin.site.register(ArchivedSeason)
+admin.site.register(SnowGrid)
+admin.site.register(SiteAlertState)
@@ -0,0 +1,237 @@
+import collections
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import AlertRule, AlertOutbox, SiteAlertState, SnotelData
+
+
+logger = logging.getLogger('testlogger')
+
+WINDOW_SECONDS = 24 * 3600
+
+
+class SnowWindow:
+    """
+    A site's snow depths over the last 24 hours, for new-snow totals.
+
+    Readings older than 24 hours are dropped as new ones arrive, except the latest
+    of them, which is the baseline the 24h gain is measured from (as in the snow grid).
+
+    Attributes:
+        readings (collections.deque): (epoch, depth) pairs, oldest first.
+    """
+
+    def __init__(self, readings=()):
+        self.readings = collections.deque(tuple(reading) for reading in readings)
+
+    def push(self, epoch, depth):
+        self.readings.append((epoch, depth))
+        cutoff = epoch - WINDOW_SECONDS
+        while len(self.readings) > 1 and self.readings[1][0] <= cutoff:
+            self.readings.popleft()
+
+    def new_snow(self):
+        """
+        Returns the gain from the 24h baseline to the latest depth, or None without 24 hours of history.
+        """
+        baseline_epoch, baseline = self.readings[0]
+        epoch, depth = self.readings[-1]
+        if baseline_epoch > epoch - WINDOW_SECONDS:
+            return None
+        return max(depth - baseline, 0.0)
+
+
+class AlertEvaluator:
+    """
+    Checks alert rules against newly inserted observations and queues fired alerts.
+
+    Each site keeps a small SiteAlertState (its last evaluated time, a 24h snow
+    window and which rules are active), so a batch costs O(new rows x rules) and
+    never rereads history. A rule fires when its condition starts to hold and is
+    re-armed once it stops holding. Observations older than ALERT_MAX_AGE_HOURS
+    (e.g. a first backfill) update the state without firing, and observations at
+    or before a site's last evaluated time (late backfills) are skipped.
+
+    Fired alerts are written to AlertOutbox in the same transaction as the state,
+    for the `deliver_alerts` worker to send. If a batch fails to evaluate, its
+    sites' last evaluated times don't move, so the site's next batch replays the
+    stored rows since then (within the last day and ALERT_MAX_AGE_HOURS) first.
+    """
+
+    def __init__(self):
+        self._rules = None
+
+    @property
+    def rules(self):
+        # Loaded on first use, from the ingest's writer thread rather than the event loop.
+        if self._rules is None:
+            self._rules = list(AlertRule.objects.filter(enabled=True))
+        return self._rules
+
+    def _seed_states(self, first_seen):
+        """
+        Builds states for sites evaluated for the first time, with the day of depths before their new rows.
+        """
+        if not first_seen:
+            return {}
+        states = {site_id: SiteAlertState(snotel_site_id=site_id) for site_id in first_seen}
+        windows = {site_id: SnowWindow() for site_id in first_seen}
+        since = min(first_seen.values()) - timedelta(seconds=WINDOW_SECONDS)
+        rows = (SnotelData.objects.filter(snotel_site_id__in=list(first_seen), timestamp__gte=since,
+                                          snow_depth__isnull=False)
+                .order_by('snotel_site_id', 'timestamp')
+                .values_list('snotel_site_id', 'timestamp', 'snow_depth'))
+        for site_id, timestamp, depth in rows:
+            if timestamp < first_seen[site_id]:
+                windows[site_id].push(timestamp.timestamp(), depth)
+        for site_id, state in states.items():
+            state.window = list(windows[site_id].readings)
+        return states
+
+    def _missed_rows(self, states, first_new):
+        """
+        Returns stored observations between each site's last evaluated time and its new rows.
+        """
+        since = timezone.now() - timedelta(seconds=WINDOW_SECONDS, hours=settings.ALERT_MAX_AGE_HOURS)
+        gaps = {site_id: (max(state.last_timestamp, since), first_new[site_id]) for site_id, state in states.items()
+                if state.last_timestamp is not None and max(state.last_timestamp, since) < first_new[site_id]}
+        if not gaps:
+            return []
+        rows = (SnotelData.objects.filter(snotel_site_id__in=list(gaps),
+                                          timestamp__gt=min(after for after, _ in gaps.values()),
+                                          timestamp__lt=max(before for _, before in gaps.values()))
+                .values_list('snotel_site_id', 'timestamp', 'temp', 'snow_depth'))
+        return [row for row in rows if gaps[row[0]][0] < row[1] < gaps[row[0]][1]]
+
+    def evaluate(self, rows):
+        """
+        Evaluates the enabled rules over newly inserted observations.
+
+        Args:
+            rows (list): (snotel_site_id, timestamp, temp, snow_depth) tuples, in any order.
+
+        Returns:
+            int: The number of alerts queued.
+        """
+        if not rows or not self.rules:
+            return 0
+        by_site = collections.defaultdict(list)
+        for row in sorted(rows, key=lambda row: (row[0], row[1])):
+            by_site[row[0]].append(row)
+        fire_after = timezone.now() - timedelta(hours=settings.ALERT_MAX_AGE_HOURS)
+
+        outbox = []
+        with transaction.atomic():
+            states = SiteAlertState.objects.select_for_update().in_bulk(list(by_site))
+            first_new = {site_id: site_rows[0][1] for site_id, site_rows in by_site.items()}
+            new_states = self._seed_states({site_id: timestamp for site_id, timestamp in first_new.items()
+                                            if site_id not in states})
+            missed = self._missed_rows(states, first_new)
+            if missed:
+                logger.warning("Replaying %s unevaluated rows for %s sites", len(missed),
+                               len({row[0] for row in missed}))
+                for row in sorted(missed, key=lambda row: (row[0], row[1]), reverse=True):
+                    by_site[row[0]].insert(0, row)
+
+            for site_id, site_rows in by_site.items():
+                state = states.get(site_id) or new_states[site_id]
+                rules = [rule for rule in self.rules if rule.snotel_site_id in (None, site_id)]
+                window = SnowWindow(state.window)
+                active = set(state.active_rules)
+                for _, timestamp, temp, depth in site_rows:
+                    if state.last_timestamp is not None and timestamp <= state.last_timestamp:
+                        continue
+                    state.last_timestamp = timestamp
+                    values = {AlertRule.TEMP: temp, AlertRule.SNOW_DEPTH: depth, AlertRule.NEW_SNOW_24H: None}
+                    if depth is not None:
+                        window.push(timestamp.timestamp(), depth)
+                        values[AlertRule.NEW_SNOW_24H] = window.new_snow()
+                    for rule in rules:
+                        value = values[rule.metric]
+                        if value is None:
+                            continue
+                        if not rule.matches(value):
+                            active.discard(rule.pk)
+                        elif rule.pk not in active:
+                            active.add(rule.pk)
+                            if timestamp >= fire_after:
+                                outbox.append(AlertOutbox(rule=rule, snotel_site_id=site_id,
+                                                          observed_at=timestamp, value=value))
+                state.window = [list(reading) for reading in window.readings]
+                state.active_rules = sorted(active)
+
+            SiteAlertState.objects.bulk_create(list(new_states.values()))
+            SiteAlertState.objects.bulk_update(list(states.values()), ['last_timestamp', 'window', 'active_rules'])
+            AlertOutbox.objects.bulk_create(outbox)
+
+        if outbox:
+            logger.info("Queued %s alerts for %s sites", len(outbox), len({alert.snotel_site_id for alert in outbox}))
+        return len(outbox)
+
+
+def alert_payload(alert):
+    rule, site = alert.rule, alert.snotel_site
+    return {
+        'rule': rule.name,
+        'metric': rule.metric,
+        'comparison': rule.comparison,
+        'threshold': rule.threshold,
+        'value': alert.value,
+        'observed_at': alert.observed_at.isoformat(),
+        'site': {'site_id': site.site_id, 'name': site.name, 'lat': site.lat, 'lon': site.lon},
+    }
+
+
+def deliver_due_alerts(session, limit=None):
+    """
+    Posts due alerts from the outbox to their rules' webhooks.
+
+    Due alerts are claimed in a short transaction with SKIP LOCKED, which counts the
+    attempt and leases them by pushing `next_attempt_at` past the time the whole
+    batch could take to post. Several workers can drain the outbox at once, and
+    alerts claimed by a worker that dies are retried once the lease runs out. The
+    posts happen outside the transaction and each alert is updated on its own, so
+    one bad alert never holds rows locked or re-sends the others. A failed post is
+    retried with exponential backoff until ALERT_DELIVERY_MAX_ATTEMPTS, after which
+    the alert is marked failed.
+
+    Args:
+        session (requests.Session): Session used for the posts.
+        limit (int): Maximum alerts to send, default ALERT_DELIVERY_BATCH.
+
+    Returns:
+        int: The number of alerts attempted.
+    """
+    limit = limit or settings.ALERT_DELIVERY_BATCH
+    lease = timedelta(seconds=limit * settings.ALERT_WEBHOOK_TIMEOUT_SECONDS + 60)
+    with transaction.atomic():
+        due = list(AlertOutbox.objects.select_for_update(skip_locked=True, of=('self',))
+                   .select_related('rule', 'snotel_site')
+                   .filter(status=AlertOutbox.PENDING, next_attempt_at__lte=timezone.now())
+                   .order_by('next_attempt_at')[:limit])
+        for alert in due:
+            alert.attempts += 1
+            alert.next_attempt_at = timezone.now() + lease
+        AlertOutbox.objects.bulk_update(due, ['attempts', 'next_attempt_at'])
+
+    for alert in due:
+        try:
+            response = session.post(alert.rule.webhook_url, json=alert_payload(alert),
+                                    timeout=settings.ALERT_WEBHOOK_TIMEOUT_SECONDS)
+            response.raise_for_status()
+        except Exception as e:
+            # Any failure, not just a RequestException, only affects this alert.
+            alert.last_error = str(e)
+            if alert.attempts >= settings.ALERT_DELIVERY_MAX_ATTEMPTS:
+                alert.status = AlertOutbox.FAILED
+                logger.error("Giving up on alert %s after %s attempts: %s", alert.pk, alert.attempts, str(e))
+            else:
+                alert.next_attempt_at = timezone.now() + timedelta(seconds=30 * 2 ** (alert.attempts - 1))
+            alert.save(update_fields=['status', 'next_attempt_at', 'last_error'])
+            continue
+        alert.status = AlertOutbox.DELIVERED
+        alert.delivered_at = timezone.now()
+        alert.save(update_fields=['status', 'delivered_at'])
+    return len(due)
@@ -0,0 +1,160 @@
+import json
+import mimetypes
+import os
+import threading
+from django.conf import settings
+
+
+LEGACY_ASSETS_DIR = os.path.join(os.path.dirname(__file__), 'static')
+
+# Content-Encoding -> suffix of the precompressed variant written by WhiteNoise, in order of preference.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class Asset:
+    """
+    A servable file and its precompressed variants.
+
+    Attributes:
+        name (str): The requested name.
+        immutable (bool): True if the name is content-hashed and can be cached forever.
+        content_type (str): The MIME type of the uncompressed file.
+        variants (dict): Content-Encoding (None for identity) -> (path, size, etag).
+    """
+
+    def __init__(self, name, path, immutable):
+        self.name = name
+        self.immutable = immutable
+        self.content_type = _content_type(path)
+        self.variants = {None: _stat(path)}
+        for encoding, suffix in ENCODINGS:
+            if os.path.isfile(path + suffix):
+                self.variants[encoding] = _stat(path + suffix)
+
+    def negotiate(self, accept_encoding):
+        """
+        Picks the best variant the client accepts.
+
+        Args:
+            accept_encoding (str): The request's Accept-Encoding header.
+
+        Returns:
+            tuple: (encoding or None, path, size, etag).
+        """
+        accepted = parse_accept_encoding(accept_encoding)
+        for encoding, _ in ENCODINGS:
+            if encoding in self.variants and accepted.get(encoding, accepted.get('*', 0)) > 0:
+                return (encoding,) + self.variants[encoding]
+        return (None,) + self.variants[None]
+
+
+def _stat(path):
+    stat = os.stat(path)
+    return path, stat.st_size, f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+
+
+def _content_type(path):
+    extension = os.path.splitext(path)[1]
+    mimetypes_map = getattr(settings, 'WHITENOISE_MIMETYPES', {})
+    content_type = mimetypes_map.get(extension) or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type == 'application/javascript':
+        content_type += '; charset=utf-8'
+    return content_type
+
+
+def parse_accept_encoding(header):
+    """
+    Parses an Accept-Encoding header.
+
+    Args:
+        header (str): The header value, e.g. 'gzip, br;q=0.9'.
+
+    Returns:
+        dict: Quality value by lower-cased encoding; 0 for an invalid quality.
+    """
+    accepted = {}
+    for part in header.split(','):
+        token, _, params = part.strip().partition(';')
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token.strip().lower()] = quality
+    return accepted
+
+
+class AssetIndex:
+    """
+    Memory-cached lookup of static assets.
+
+    Names are resolved through the manifest that CompressedManifestStaticFilesStorage
+    writes to STATIC_ROOT, so both logical names ('js/main.js') and hashed names
+    ('js/main.1a2b3c.js') are served from the collected, precompressed files.
+    Anything not in the manifest falls back to the app's own static directory.
+    Each name is stat'ed once per process; collectstatic runs on deploy, which
+    restarts the workers.
+    """
+
+    def __init__(self, static_root, fallback_dir=LEGACY_ASSETS_DIR):
+        self.static_root = static_root
+        self.fallback_dir = fallback_dir
+        self._lock = threading.Lock()
+        self._assets = {}
+        self._manifest = None
+
+    def _load_manifest(self):
+        path = os.path.join(self.static_root, 'staticfiles.json') if self.static_root else None
+        if path and os.path.isfile(path):
+            with open(path) as f:
+                paths = json.load(f).get('paths', {})
+        else:
+            paths = {}
+        return paths, set(paths.values())
+
+    def _resolve(self, name):
+        if self._manifest is None:
+            self._manifest = self._load_manifest()
+        paths, hashed_names = self._manifest
+
+        if name in hashed_names:
+            return _safe_join(self.static_root, name), True
+        if name in paths:
+            return _safe_join(self.static_root, paths[name]), False
+        return _safe_join(self.fallback_dir, name), False
+
+    def get(self, name):
+        """
+        Looks up an asset by name.
+
+        Args:
+            name (str): The logical or hashed file name relative to the static root.
+
+        Returns:
+            Asset: The asset, or None if there is no such file.
+        """
+        with self._lock:
+            if name in self._assets:
+                return self._assets[name]
+        path, immutable = self._resolve(name)
+        if not path or not os.path.isfile(path):
+            return None
+        asset = Asset(name, path, immutable)
+        with self._lock:
+            self._assets[name] = asset
+        return asset
+
+
+def _safe_join(root, name):
+    root = os.path.abspath(root)
+    path = os.path.abspath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root:
+        return None
+    return path
+
+
+asset_index = AssetIndex(settings.STATIC_ROOT)
@@ -0,0 +1,186 @@
+import logging
+from datetime import datetime, timezone as dt_timezone
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+from .hot_cache import SiteSeries
+from .models import SnotelData, ArchivedSeason
+
+
+logger = logging.getLogger('testlogger')
+
+# Parquet has no second-resolution timestamps, so store milliseconds.
+TIMESTAMP = pa.timestamp('ms', tz='UTC')
+SCHEMA = pa.schema([
+    ('timestamp', TIMESTAMP),
+    ('temp', pa.float64()),
+    ('snow_depth', pa.float64()),
+])
+
+# About a month of hourly rows per row group, so range reads skip whole months using the column statistics.
+ROW_GROUP_ROWS = 24 * 31
+
+
+def season_of(timestamp):
+    """
+    Returns the season (water year) a timestamp falls in, e.g. 2023 for 2022-10-01 to 2023-09-30.
+    """
+    timestamp = timestamp.astimezone(dt_timezone.utc)
+    return timestamp.year + 1 if timestamp.month >= 10 else timestamp.year
+
+
+def season_bounds(season):
+    """
+    Returns the start (inclusive) and end (exclusive) of a season in UTC.
+    """
+    return datetime(season - 1, 10, 1, tzinfo=dt_timezone.utc), datetime(season, 10, 1, tzinfo=dt_timezone.utc)
+
+
+def _parquet_bytes(df):
+    sink = pa.BufferOutputStream()
+    pq.write_table(pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False), sink,
+                   compression='zstd', row_group_size=ROW_GROUP_ROWS, write_statistics=True)
+    return sink.getvalue().to_pybytes()
+
+
+class ColdStorage:
+    """
+    Parquet archive of closed seasons of observations.
+
+    Each site's season is one zstd-compressed Parquet file sorted by time, stored
+    in its ArchivedSeason row, so every dyno reads the same archive and it is
+    backed up with the database. Reads push the requested time range down to the
+    row group statistics, so only the months asked for are decoded.
+    """
+
+    def closed_seasons(self, keep=0):
+        """
+        Lists seasons that have ended and still have observations in SnotelData.
+
+        Args:
+            keep (int): Number of most recent closed seasons to leave in the database.
+
+        Returns:
+            list: The seasons, oldest first.
+        """
+        bounds = SnotelData.objects.aggregate(first=Min('timestamp'))
+        if bounds['first'] is None:
+            return []
+        last_closed = season_of(timezone.now()) - 1 - keep
+        return list(range(season_of(bounds['first']), last_closed + 1))
+
+    def archive(self, site_id, season, purge=None):
+        """
+        Copies a site's season of observations from SnotelData into its Parquet archive.
+
+        Rows already archived for the season (e.g. from before a late backfill) are
+        merged with the new ones. Nothing moves unless purging: the rows stay in
+        SnotelData and the archive is only a copy, which is left alone while it
+        holds as many rows as the database has for the season. When purging, the
+        rows are deleted from SnotelData once the stored archive has been read
+        back and holds every row. A season that was purged before is always
+        purged again, since it is already served from the archive.
+
+        Args:
+            site_id (str): The site ID.
+            season (int): The season to archive.
+            purge (bool): Delete the archived rows from SnotelData, default COLD_STORAGE_PURGE.
+
+        Returns:
+            int: The number of rows archived, 0 if the archive was already up to date.
+        """
+        if purge is None:
+            purge = settings.COLD_STORAGE_PURGE
+        start, end = season_bounds(season)
+        rows = SnotelData.objects.filter(snotel_site_id=site_id, timestamp__gte=start, timestamp__lt=end)
+        existing = ArchivedSeason.objects.defer('data').filter(snotel_site_id=site_id, season=season).first()
+        # An unpurged archive is a copy of the rows, so it only needs rewriting once a backfill adds to them.
+        if (existing is not None and not existing.purged and not purge
+                and rows.values('timestamp').distinct().count() == existing.row_count):
+            return 0
+        df = pd.DataFrame.from_records(rows.values('id', 'timestamp', 'temp', 'snow_depth'),
+                                       columns=['id', 'timestamp', 'temp', 'snow_depth'])
+        if df.empty:
+            return 0
+        max_id = int(df['id'].max())
+
+        frames = [df.drop(columns='id')]
+        if existing is not None:
+            frames.insert(0, pq.read_table(pa.BufferReader(bytes(existing.data))).to_pandas())
+            purge = purge or existing.purged
+        archived = (pd.concat(frames, ignore_index=True)
+                    .drop_duplicates('timestamp', keep='last')
+                    .sort_values('timestamp'))
+
+        with transaction.atomic():
+            stored, _ = ArchivedSeason.objects.update_or_create(
+                snotel_site_id=site_id,
+                season=season,
+                defaults={'data': _parquet_bytes(archived), 'row_count': len(archived), 'start': start, 'end': end},
+            )
+            if not purge:
+                return len(df)
+            data = ArchivedSeason.objects.filter(pk=stored.pk).values_list('data', flat=True).get()
+            stored_rows = pq.read_metadata(pa.BufferReader(bytes(data))).num_rows
+            if stored_rows != len(archived):
+                logger.error("Archive of %s season %s holds %s rows, expected %s; keeping the rows in the database",
+                             site_id, season, stored_rows, len(archived))
+                return len(df)
+            # Rows inserted since the read above stay in the database for the next run.
+            rows.filter(id__lte=max_id).delete()
+            ArchivedSeason.objects.filter(pk=stored.pk).update(purged=True)
+        return len(df)
+
+    def read(self, seasons, start, end, after=None, limit=None):
+        """
+        Reads a site's archived observations between two times.
+
+        Seasons are read oldest first and reading stops once `limit` rows are found.
+        A season whose archive can't be read is logged and skipped.
+
+        Args:
+            seasons (list): The site's purged ArchivedSeason rows overlapping the range.
+            start (datetime): Start of the range (inclusive).
+            end (datetime): End of the range (inclusive).
+            after (float): If given, only observations strictly after this epoch time.
+            limit (int): Maximum number of observations to return.
+
+        Returns:
+            list: Dicts with 'timestamp_station_local', 'temp' and 'snow_depth', oldest first.
+        """
+        if after is None:
+            lower = ds.field('timestamp') >= pa.scalar(start, type=TIMESTAMP)
+        else:
+            lower = ds.field('timestamp') > pa.scalar(int(after * 1000), type=TIMESTAMP)
+        upper = ds.field('timestamp') <= pa.scalar(end, type=TIMESTAMP)
+
+        tables = []
+        num_rows = 0
+        for archived in sorted(seasons, key=lambda s: s.season):
+            try:
+                table = pq.read_table(
+                    pa.BufferReader(bytes(archived.data)),
+                    columns=['timestamp', 'temp', 'snow_depth'],
+                    filters=lower & upper,
+                )
+            except (pa.ArrowException, OSError) as e:
+                logger.error("Could not read archive of %s season %s: %s", archived.snotel_site_id, archived.season,
+                             str(e))
+                continue
+            tables.append(table)
+            num_rows += table.num_rows
+            if limit is not None and num_rows >= limit:
+                break
+        if not tables:
+            return []
+        table = pa.concat_tables(tables)
+        series = SiteSeries(table['timestamp'].cast(pa.int64()).to_numpy() // 1000,
+                            table['temp'].to_numpy(), table['snow_depth'].to_numpy())
+        return series.between(start.timestamp(), end.timestamp(), after, limit)
+
+cold_storage = ColdStorage()
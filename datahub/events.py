@@ -0,0 +1,242 @@
+import asyncio
+import collections
+import json
+import logging
+import time
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import OuterRef, Subquery
+from .hot_cache import hot_window_cache
+from .models import SnotelSite, SnotelData
+
+
+logger = logging.getLogger('testlogger')
+
+# pg_notify payloads must be shorter than 8000 bytes.
+MAX_PAYLOAD_BYTES = 7500
+
+# Longest wait between attempts to reconnect a lost LISTEN connection.
+LISTEN_RETRY_MAX_SECONDS = 60
+
+
+def notify_payloads(site_ids):
+    """
+    Splits changed site IDs into NOTIFY payloads that fit PostgreSQL's size limit.
+
+    Args:
+        site_ids (list): The IDs of sites with new observations.
+
+    Returns:
+        list: JSON payloads of the form {"sites": [...]}.
+    """
+    payloads = []
+    chunk = []
+    size = 0
+    for site_id in site_ids:
+        if chunk and size + len(site_id) + 4 > MAX_PAYLOAD_BYTES:
+            payloads.append(json.dumps({'sites': chunk}))
+            chunk, size = [], 0
+        chunk.append(site_id)
+        size += len(site_id) + 4
+    if chunk:
+        payloads.append(json.dumps({'sites': chunk}))
+    return payloads
+
+
+async def latest_readings(site_ids):
+    """
+    Returns the station list entries, with their latest readings, for the given sites.
+    """
+    latest = SnotelData.objects.filter(snotel_site=OuterRef('pk')).order_by('-timestamp')
+    stations = SnotelSite.objects.filter(site_id__in=site_ids).annotate(
+        latest_snow_depth=Subquery(latest.values('snow_depth')[:1]),
+        latest_temp=Subquery(latest.values('temp')[:1]),
+        latest_timestamp=Subquery(latest.values('timestamp')[:1]),
+    ).values('site_id', 'name', 'lat', 'lon', 'elevation_ft', 'latest_snow_depth', 'latest_temp', 'latest_timestamp')
+    return [station async for station in stations]
+
+
+class ObservationBroadcaster:
+    """
+    Fans out new-observation notifications from the ingest to server-sent event streams.
+
+    `insert_snotel_data` sends a NOTIFY on SNOTEL_NOTIFY_CHANNEL with the changed
+    site IDs when it commits. Each web worker holds one LISTEN connection, looks up
+    the changed sites' latest readings once per notification and queues the event
+    for every open stream. Recent events are kept so a reconnecting client can
+    catch up from its Last-Event-ID. Event IDs are publish times in milliseconds,
+    so they are comparable across workers. A lost LISTEN connection is reconnected
+    with exponential backoff.
+
+    Attributes:
+        history (collections.deque): Recent (event_id, data) pairs.
+    """
+
+    def __init__(self, history_size=100, queue_size=100):
+        self.history = collections.deque(maxlen=history_size)
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._connection = None
+        self._fileno = None
+        self._loop = None
+        self._tasks = set()
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def replay(self, last_event_id):
+        """
+        Returns the kept events newer than `last_event_id`.
+        """
+        try:
+            last_event_id = int(last_event_id)
+        except (TypeError, ValueError):
+            return []
+        return [event for event in self.history if event[0] > last_event_id]
+
+    async def publish(self, site_ids):
+        """
+        Sends the latest readings of the given sites to every open stream.
+
+        Args:
+            site_ids (list): The IDs of sites with new observations.
+        """
+        hot_window_cache.invalidate()
+        readings = await latest_readings(site_ids)
+        event_id = time.time_ns() // 1_000_000
+        if self.history and event_id <= self.history[-1][0]:
+            event_id = self.history[-1][0] + 1
+        event = (event_id, json.dumps({'sites': readings}, cls=DjangoJSONEncoder))
+        self.history.append(event)
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # End a stream this far behind; the client reconnects and catches up from its Last-Event-ID.
+                logger.warning("Closing slow event stream")
+                self.unsubscribe(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def start(self):
+        """
+        Starts listening for notifications on this worker's event loop, if not already.
+
+        Only PostgreSQL supports LISTEN/NOTIFY; on other databases streams stay open
+        but never receive events.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is loop or connections['default'].vendor != 'postgresql':
+            return
+        self._loop = loop
+        self._run(self._listen())
+
+    def _run(self, coroutine):
+        # The loop only keeps weak references to tasks, so hold them until they finish.
+        task = self._loop.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("New observation broadcast failed: %s", str(task.exception()))
+
+    async def _listen(self):
+        """
+        Opens the LISTEN connection, retrying with exponential backoff until it succeeds.
+        """
+        delay = 1
+        while True:
+            try:
+                self._connection = await self._loop.run_in_executor(None, self._connect)
+            except Exception as e:
+                logger.error("Could not listen for new observations, retrying in %ss: %s", delay, str(e))
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, LISTEN_RETRY_MAX_SECONDS)
+                continue
+            # Kept, since fileno() fails once the connection is broken.
+            self._fileno = self._connection.fileno()
+            self._loop.add_reader(self._fileno, self._on_readable)
+            return
+
+    def _connect(self):
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        connection = psycopg2.connect(**connections['default'].get_connection_params())
+        connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN "{settings.SNOTEL_NOTIFY_CHANNEL}"')
+        return connection
+
+    def _on_readable(self):
+        try:
+            self._connection.poll()
+        except Exception as e:
+            logger.error("Lost the new observation listener, reconnecting: %s", str(e))
+            self._loop.remove_reader(self._fileno)
+            self._connection.close()
+            self._connection = None
+            self._run(self._listen())
+            return
+        while self._connection.notifies:
+            notify = self._connection.notifies.pop(0)
+            try:
+                site_ids = json.loads(notify.payload)['sites']
+            except (ValueError, KeyError):
+                logger.warning("Ignoring malformed notification %r", notify.payload)
+                continue
+            self._run(self.publish(site_ids))
+
+
+observation_broadcaster = ObservationBroadcaster()
+
+
+def _format_event(event):
+    event_id, data = event
+    return f'id: {event_id}\nevent: observations\ndata: {data}\n\n'
+
+
+async def event_stream(last_event_id=None):
+    """
+    Yields a server-sent event stream of new observations.
+
+    Streams end after SSE_MAX_STREAM_SECONDS; EventSource clients reconnect on
+    their own and catch up from their Last-Event-ID.
+
+    Args:
+        last_event_id (str): The Last-Event-ID sent by a reconnecting client.
+    """
+    loop = asyncio.get_running_loop()
+    await observation_broadcaster.start()
+    queue = observation_broadcaster.subscribe()
+    try:
+        yield f'retry: {settings.SSE_RETRY_MS}\n\n'
+        sent = 0
+        for event in observation_broadcaster.replay(last_event_id):
+            sent = event[0]
+            yield _format_event(event)
+
+        deadline = loop.time() + settings.SSE_MAX_STREAM_SECONDS
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=min(settings.SSE_KEEPALIVE_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                # Comments keep proxies from closing idle streams and surface disconnected clients.
+                yield ': keepalive\n\n'
+                continue
+            if event is None:
+                return
+            if event[0] > sent:
+                sent = event[0]
+                yield _format_event(event)
+    finally:
+        observation_broadcaster.unsubscribe(queue)
@@ -0,0 +1,168 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from .models import SnotelData, IngestRun
+
+
+logger = logging.getLogger('testlogger')
+
+
+class SiteSeries:
+    """
+    A site's recent observations as parallel arrays sorted by time.
+
+    Attributes:
+        epoch (np.ndarray): Observation times in epoch seconds (int64).
+        temp (np.ndarray): Air temperatures, NaN where missing.
+        snow_depth (np.ndarray): Snow depths, NaN where missing.
+    """
+
+    def __init__(self, epoch, temp, snow_depth):
+        self.epoch = epoch
+        self.temp = temp
+        self.snow_depth = snow_depth
+
+    def between(self, start, end, after=None, limit=None):
+        """
+        Returns the observations in [start, end] in the StationView response format.
+
+        Args:
+            start (float): Start of the range in epoch seconds.
+            end (float): End of the range in epoch seconds.
+            after (float): If given, only observations strictly after this time (a page cursor).
+            limit (int): Maximum number of observations to return.
+
+        Returns:
+            list: Dicts with 'timestamp_station_local', 'temp' and 'snow_depth'.
+        """
+        if after is None:
+            i = np.searchsorted(self.epoch, start, side='left')
+        else:
+            i = np.searchsorted(self.epoch, after, side='right')
+        j = np.searchsorted(self.epoch, end, side='right')
+        if limit is not None:
+            j = min(j, i + limit)
+        # Same format DjangoJSONEncoder gives a whole-second UTC datetime.
+        timestamps = np.datetime_as_string(self.epoch[i:j].astype('datetime64[s]'), timezone='UTC')
+        return [{'timestamp_station_local': ts,
+                 'temp': None if temp != temp else temp,
+                 'snow_depth': None if depth != depth else depth}
+                for ts, temp, depth in zip(timestamps.tolist(), self.temp[i:j].tolist(), self.snow_depth[i:j].tolist())]
+
+
+class HotWindowCache:
+    """
+    In-process cache of the last HOT_CACHE_WINDOW_DAYS of observations for every site.
+
+    Almost every station request asks for the last few days, so those are served
+    from NumPy arrays with a binary search instead of a database query. The cache
+    reloads when a new IngestRun appears, checking at most every
+    HOT_CACHE_CHECK_SECONDS, so new data shows up within that long of an ingest
+    finishing, or on the next request after `invalidate`. Requests reaching back
+    before the cached window return None and should fall back to the database.
+
+    Attributes:
+        window (timedelta): How far back the cache holds observations.
+        check_seconds (float): Minimum seconds between checks for a new ingest run.
+    """
+
+    def __init__(self, window_days=None, check_seconds=None):
+        self.window = timedelta(days=window_days or settings.HOT_CACHE_WINDOW_DAYS)
+        self.check_seconds = check_seconds if check_seconds is not None else settings.HOT_CACHE_CHECK_SECONDS
+        self._series = {}
+        self._start = None
+        self._run_id = None
+        self._checked_at = None
+        self._stale = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Loads the window from the database, replacing the current contents.
+
+        Returns:
+            int: The number of observations loaded.
+        """
+        start = timezone.now() - self.window
+        rows = (SnotelData.objects.filter(timestamp__gte=start)
+                .order_by('snotel_site_id', 'timestamp')
+                .values_list('snotel_site_id', 'timestamp', 'temp', 'snow_depth'))
+        site_ids, timestamps, temps, depths = [], [], [], []
+        for site_id, timestamp, temp, depth in rows.iterator(chunk_size=10000):
+            site_ids.append(site_id)
+            timestamps.append(timestamp.timestamp())
+            temps.append(temp)
+            depths.append(depth)
+
+        epoch = np.array(timestamps, dtype=np.int64)
+        temp = np.array(temps, dtype=np.float64)
+        snow_depth = np.array(depths, dtype=np.float64)
+        series = {}
+        # Rows are sorted by site, so each site is one contiguous slice.
+        boundaries = [i for i in range(1, len(site_ids)) if site_ids[i] != site_ids[i - 1]]
+        for i, j in zip([0] + boundaries, boundaries + [len(site_ids)]):
+            if i < j:
+                series[site_ids[i]] = SiteSeries(epoch[i:j], temp[i:j], snow_depth[i:j])
+
+        self._series, self._start = series, start.timestamp()
+        logger.info("Loaded %s observations for %s sites into the hot window cache", len(site_ids), len(series))
+        return len(site_ids)
+
+    def ensure_fresh(self):
+        """
+        Reloads the cache if it is empty, was invalidated or an ingest run has finished since the last load.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is not None and now - self._checked_at < self.check_seconds:
+                return
+            self._checked_at = now
+            run_id = IngestRun.objects.order_by('-pk').values_list('pk', flat=True).first()
+            if self._start is not None and run_id == self._run_id and not self._stale:
+                return
+            # Cleared first, so an invalidate() arriving during the load triggers another one.
+            self._stale = False
+            self.load()
+            self._run_id = run_id
+
+    def invalidate(self):
+        """
+        Makes the next request reload the cache.
+
+        Inserted rows are announced before the ingest saves its IngestRun, so the
+        run ID can't tell that they arrived; the reload is forced instead.
+        """
+        self._stale = True
+        self._checked_at = None
+
+    async def aensure_fresh(self):
+        # Only hop to a thread for the database when a check is due.
+        if self._checked_at is None or time.monotonic() - self._checked_at >= self.check_seconds:
+            await sync_to_async(self.ensure_fresh)()
+
+    def get(self, site_id, start, end, after=None, limit=None):
+        """
+        Looks up a site's observations between two times.
+
+        Args:
+            site_id (str): The site ID.
+            start (datetime): Start of the range (inclusive).
+            end (datetime): End of the range (inclusive).
+            after (float): If given, only observations strictly after this epoch time.
+            limit (int): Maximum number of observations to return.
+
+        Returns:
+            list: The observations, or None if the range is not covered by the cache.
+        """
+        series = self._series.get(site_id)
+        if series is None or self._start is None or start.timestamp() < self._start:
+            return None
+        return series.between(start.timestamp(), end.timestamp(), after, limit)
+
+
+hot_window_cache = HotWindowCache()
@@ -0,0 +1,219 @@
+import cProfile
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+logger = logging.getLogger('testlogger')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_profile = ContextVar('request_profile', default=None)
+_profiler_lock = threading.Lock()
+
+
+class RequestProfile:
+    """
+    Timings collected while a single request is being handled.
+    """
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.stage_seconds = {}
+
+    def server_timing(self, total_seconds):
+        """
+        Formats the profile as a `Server-Timing` header value.
+        """
+        parts = [f'total;dur={total_seconds * 1000:.1f}',
+                 f'db;dur={self.db_seconds * 1000:.1f};desc="{self.db_queries} queries"']
+        parts += [f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.stage_seconds.items()]
+        return ', '.join(parts)
+
+
+@contextmanager
+def profile_stage(name):
+    """
+    Adds the time spent in the enclosed block to the current request's profile.
+
+    Does nothing when profiling is disabled or there is no request in progress.
+
+    Args:
+        name (str): The stage name reported in the `Server-Timing` header, e.g. 'serialize'.
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.stage_seconds[name] = profile.stage_seconds.get(name, 0.0) + time.perf_counter() - start
+
+
+def _db_execute_wrapper(execute, sql, params, many, context):
+    profile = _current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.db_queries += 1
+        profile.db_seconds += time.perf_counter() - start
+
+
+def _install_db_wrapper(sender, connection, **kwargs):
+    if _db_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_execute_wrapper)
+
+
+class LatencyHistograms:
+    """
+    In-process per-endpoint request latency histograms.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def observe(self, endpoint, seconds):
+        with self._lock:
+            series = self._endpoints.setdefault(endpoint, {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += seconds
+            series['count'] += 1
+
+    def render_prometheus(self):
+        """
+        Renders the histograms in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics text, empty if no request has been observed.
+        """
+        with self._lock:
+            if not self._endpoints:
+                return ''
+            name = 'funtel_http_request_duration_seconds'
+            lines = [f'# HELP {name} Request latency per endpoint.', f'# TYPE {name} histogram']
+            for endpoint, series in sorted(self._endpoints.items()):
+                for bound, count in zip(self.buckets, series['buckets']):
+                    lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="+Inf"}} {series["count"]}')
+                lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {series["sum"]}')
+                lines.append(f'{name}_count{{endpoint="{endpoint}"}} {series["count"]}')
+            return '\n'.join(lines) + '\n'
+
+
+latency_histograms = LatencyHistograms()
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in middleware measuring the cost of each request.
+
+    Records wall time, DB query count and DB time, plus any stages the view marks
+    with `profile_stage`, and returns them in a `Server-Timing` header. Latency is
+    aggregated per endpoint for `/metrics`. A sampled fraction of requests is run
+    under cProfile and the profile is dumped if the request was slow.
+
+    Works under both WSGI and ASGI. DB queries are attributed through a context
+    variable, so queries the async ORM runs in worker threads are still counted.
+    Under ASGI a sampled cProfile dump also includes any other requests the event
+    loop interleaved with the slow one.
+
+    Enabled with the PROFILING_ENABLED setting.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.slow_seconds = settings.PROFILING_SLOW_MS / 1000
+        self.dump_dir = settings.PROFILING_DUMP_DIR
+        connection_created.connect(_install_db_wrapper, dispatch_uid='datahub_profiling_db_wrapper')
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        profiler = self._start_profiler()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stop_profiler(profiler)
+            _current_profile.reset(token)
+        return self._finish(request, response, profile, profiler, elapsed)
+
+    async def __acall__(self, request):
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        profiler = self._start_profiler()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stop_profiler(profiler)
+            _current_profile.reset(token)
+        return self._finish(request, response, profile, profiler, elapsed)
+
+    def _finish(self, request, response, profile, profiler, elapsed):
+        endpoint = self._endpoint(request)
+        latency_histograms.observe(endpoint, elapsed)
+        response['Server-Timing'] = profile.server_timing(elapsed)
+        if profiler is not None and elapsed >= self.slow_seconds:
+            self._dump(profiler, endpoint, elapsed)
+        return response
+
+    def _start_profiler(self):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        # Only one request per process is profiled at a time.
+        if not _profiler_lock.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread.
+            _profiler_lock.release()
+            return None
+        return profiler
+
+    def _stop_profiler(self, profiler):
+        if profiler is not None:
+            profiler.disable()
+            _profiler_lock.release()
+
+    def _endpoint(self, request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unresolved'
+        return match.view_name or match.route
+
+    def _dump(self, profiler, endpoint, elapsed):
+        os.makedirs(self.dump_dir, exist_ok=True)
+        filename = f"{endpoint.replace('/', '_')}-{int(time.time() * 1000)}.prof"
+        path = os.path.join(self.dump_dir, filename)
+        profiler.dump_stats(path)
+        logger.info("Slow request to %s took %.3fs, profile written to %s", endpoint, elapsed, path)
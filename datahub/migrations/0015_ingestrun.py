@@ -0,0 +1,33 @@
+# Generated by Django 4.2.1 on 2026-10-19 14:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datahub', '0014_rename_timestamp_local_snoteldata_timestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField()),
+                ('sites_requested', models.IntegerField(default=0)),
+                ('sites_fetched', models.IntegerField(default=0)),
+                ('sites_failed', models.IntegerField(default=0)),
+                ('bytes_fetched', models.BigIntegerField(default=0)),
+                ('rows_parsed', models.IntegerField(default=0)),
+                ('rows_inserted', models.IntegerField(default=0)),
+                ('rows_duplicate', models.IntegerField(default=0)),
+                ('stage_seconds', models.JSONField(default=dict)),
+                ('site_stats', models.JSONField(default=dict)),
+            ],
+            options={
+                'get_latest_by': 'finished_at',
+            },
+        ),
+    ]
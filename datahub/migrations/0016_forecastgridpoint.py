@@ -0,0 +1,35 @@
+# Generated by Django 4.2.1 on 2026-10-19 14:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datahub', '0015_ingestrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastGridpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grid_id', models.CharField(max_length=10)),
+                ('grid_x', models.IntegerField()),
+                ('grid_y', models.IntegerField()),
+                ('forecast_hourly_url', models.URLField(max_length=300)),
+                ('periods', models.JSONField(null=True)),
+                ('fetched_at', models.DateTimeField(null=True)),
+                ('expires_at', models.DateTimeField(null=True)),
+            ],
+            options={
+                'unique_together': {('grid_id', 'grid_x', 'grid_y')},
+            },
+        ),
+        migrations.AddField(
+            model_name='snotelsite',
+            name='forecast_gridpoint',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='datahub.forecastgridpoint'),
+        ),
+    ]
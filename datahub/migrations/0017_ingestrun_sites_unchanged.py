@@ -0,0 +1,18 @@
+# Generated by Django 4.2.1 on 2026-10-19 14:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datahub', '0016_forecastgridpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestrun',
+            name='sites_unchanged',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.1 on 2026-10-19 15:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datahub', '0017_ingestrun_sites_unchanged'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedSeason',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('season', models.IntegerField()),
+                ('data', models.BinaryField()),
+                ('purged', models.BooleanField(default=False)),
+                ('row_count', models.IntegerField()),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+                ('snotel_site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='datahub.snotelsite')),
+            ],
+            options={
+                'unique_together': {('snotel_site', 'season')},
+            },
+        ),
+    ]
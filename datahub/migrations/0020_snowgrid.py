@@ -0,0 +1,33 @@
+# Generated by Django 4.2.1 on 2026-10-19 15:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datahub', '0019_snoteldata_site_timestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnowGrid',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('computed_at', models.DateTimeField()),
+                ('west', models.FloatField()),
+                ('south', models.FloatField()),
+                ('east', models.FloatField()),
+                ('north', models.FloatField()),
+                ('cell_deg', models.FloatField()),
+                ('width', models.IntegerField()),
+                ('height', models.IntegerField()),
+                ('site_count', models.IntegerField()),
+                ('snow_depth', models.BinaryField()),
+                ('new_snow', models.BinaryField()),
+            ],
+            options={
+                'get_latest_by': 'computed_at',
+            },
+        ),
+    ]
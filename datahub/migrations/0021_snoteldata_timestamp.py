@@ -0,0 +1,20 @@
+# Generated by Django 4.2.1 on 2026-10-19 15:10
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # SnotelData is large and written to every hour, so build the index without locking out writes.
+    atomic = False
+
+    dependencies = [
+        ('datahub', '0020_snowgrid'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='snoteldata',
+            index=models.Index(fields=['timestamp'], name='snoteldata_timestamp'),
+        ),
+    ]
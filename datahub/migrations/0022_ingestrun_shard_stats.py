@@ -0,0 +1,18 @@
+# Generated by Django 4.2.1 on 2026-10-19 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datahub', '0021_snoteldata_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestrun',
+            name='shard_stats',
+            field=models.JSONField(default=dict),
+        ),
+    ]
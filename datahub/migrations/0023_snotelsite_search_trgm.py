@@ -0,0 +1,25 @@
+# Generated by Django 4.2.1 on 2026-10-19 15:14
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datahub', '0022_ingestrun_shard_stats'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='snotelsite',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='snotelsite_name_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='snotelsite',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('site_id'), name='gin_trgm_ops'), name='snotelsite_site_id_trgm'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.1 on 2026-10-19 15:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datahub', '0023_snotelsite_search_trgm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteAlertState',
+            fields=[
+                ('snotel_site', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='datahub.snotelsite')),
+                ('last_timestamp', models.DateTimeField(null=True)),
+                ('window', models.JSONField(default=list)),
+                ('active_rules', models.JSONField(default=list)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AlertRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('metric', models.CharField(choices=[('new_snow_24h', 'New snow in 24h (in)'), ('snow_depth', 'Snow depth (in)'), ('temp', 'Temperature (F)')], max_length=20)),
+                ('comparison', models.CharField(choices=[('above', 'Above'), ('below', 'Below')], default='above', max_length=10)),
+                ('threshold', models.FloatField()),
+                ('webhook_url', models.URLField(max_length=500)),
+                ('enabled', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('snotel_site', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='datahub.snotelsite')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AlertOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('observed_at', models.DateTimeField()),
+                ('value', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('delivered', 'Delivered'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.IntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='datahub.alertrule')),
+                ('snotel_site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='datahub.snotelsite')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['next_attempt_at'], name='alertoutbox_pending')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.1 on 2026-10-19 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datahub', '0024_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UpstreamResponse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.TextField(unique=True)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('etag', models.CharField(blank=True, default='', max_length=200)),
+                ('last_modified', models.CharField(blank=True, default='', max_length=64)),
+                ('body', models.TextField(blank=True, default='')),
+                ('fetched_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
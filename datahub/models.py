@@ -1,4 +1,7 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Upper
+from django.utils import timezone
 
 
 class SnotelSite(models.Model):
@@ -11,14 +14,41 @@ class SnotelSite(models.Model):
     lat = models.FloatField()
     lon = models.FloatField()
     elevation_ft = models.FloatField()
+    forecast_gridpoint = models.ForeignKey('ForecastGridpoint', null=True, blank=True, on_delete=models.SET_NULL)
 
-    # class Meta:
-    #     app_label = 'datahub.apps.DatahubConfig'
+    class Meta:
+        indexes = [
+            # Trigram indexes serve the case-insensitive substring matches of /api/stations/search/.
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='snotelsite_name_trgm'),
+            GinIndex(OpClass(Upper('site_id'), name='gin_trgm_ops'), name='snotelsite_site_id_trgm'),
+        ]
 
     def __str__(self):
         return self.site_id
 
 
+class ForecastGridpoint(models.Model):
+    """
+    Model representing an NWS forecast gridpoint and its cached hourly forecast.
+
+    A site's lat/lon always maps to the same gridpoint, so the mapping is kept
+    permanently; the forecast periods are refreshed once `expires_at` passes.
+    """
+    grid_id = models.CharField(max_length=10)
+    grid_x = models.IntegerField()
+    grid_y = models.IntegerField()
+    forecast_hourly_url = models.URLField(max_length=300)
+    periods = models.JSONField(null=True)
+    fetched_at = models.DateTimeField(null=True)
+    expires_at = models.DateTimeField(null=True)
+
+    class Meta:
+        unique_together = ('grid_id', 'grid_x', 'grid_y')
+
+    def __str__(self):
+        return f"{self.grid_id} {self.grid_x},{self.grid_y}"
+
+
 class SnotelData(models.Model):
     """
     Model representing data for a specific SNOTEL site at a given timestamp.
@@ -28,8 +58,196 @@ class SnotelData(models.Model):
     snow_depth = models.FloatField(null=True)
     timestamp = models.DateTimeField()
 
-    # class Meta:
-    #     app_label = 'datahub.apps.DatahubConfig'
+    class Meta:
+        indexes = [
+            # Serves history pages, latest-value lookups and the ingest merge's duplicate check.
+            models.Index(fields=['snotel_site', 'timestamp'], name='snoteldata_site_timestamp'),
+            # Serves time-window scans across all sites and the admin's date hierarchy.
+            models.Index(fields=['timestamp'], name='snoteldata_timestamp'),
+        ]
+
+    def __str__(self):
+        return f"SNOTEL Data for {self.snotel_site_id} at {self.timestamp}"
+
+
+class IngestRun(models.Model):
+    """
+    Model recording timings and counters for a single SNOTEL ingest run.
+    """
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField()
+    sites_requested = models.IntegerField(default=0)
+    sites_fetched = models.IntegerField(default=0)
+    sites_failed = models.IntegerField(default=0)
+    sites_unchanged = models.IntegerField(default=0)
+    bytes_fetched = models.BigIntegerField(default=0)
+    rows_parsed = models.IntegerField(default=0)
+    rows_inserted = models.IntegerField(default=0)
+    rows_duplicate = models.IntegerField(default=0)
+    stage_seconds = models.JSONField(default=dict)
+    site_stats = models.JSONField(default=dict)
+    shard_stats = models.JSONField(default=dict)
+
+    class Meta:
+        get_latest_by = 'finished_at'
+
+    @property
+    def duration_seconds(self):
+        return (self.finished_at - self.started_at).total_seconds()
+
+    def __str__(self):
+        return f"Ingest run at {self.started_at}"
+
+
+class UpstreamResponse(models.Model):
+    """
+    Model caching an upstream report response's validators and content hash by URL.
+
+    Lets an ingest skip sites whose report hasn't changed since the last run. The
+    body is only kept for responses reused without refetching (the station list).
+    """
+    url = models.TextField(unique=True)
+    content_hash = models.CharField(max_length=64)
+    etag = models.CharField(max_length=200, blank=True, default='')
+    last_modified = models.CharField(max_length=64, blank=True, default='')
+    body = models.TextField(blank=True, default='')
+    fetched_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.url
+
+
+class ArchivedSeason(models.Model):
+    """
+    Model holding a site's season of observations archived from SnotelData as Parquet.
+
+    Seasons are water years: season 2023 runs from 2022-10-01 to 2023-10-01 (UTC).
+    Once `purged`, the season's rows have been deleted from SnotelData and are
+    served from `data` instead.
+    """
+    snotel_site = models.ForeignKey(SnotelSite, on_delete=models.CASCADE)
+    season = models.IntegerField()
+    data = models.BinaryField()
+    purged = models.BooleanField(default=False)
+    row_count = models.IntegerField()
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('snotel_site', 'season')
+
+    def __str__(self):
+        return f"{self.snotel_site_id} season {self.season}"
+
+
+class SnowGrid(models.Model):
+    """
+    Model holding a snow-depth surface interpolated from site readings after an ingest.
+
+    Each field is a row-major float32 array (north row first, NaN where no site is
+    in range) stored gzip-compressed, ready to send as is.
+    """
+    computed_at = models.DateTimeField()
+    west = models.FloatField()
+    south = models.FloatField()
+    east = models.FloatField()
+    north = models.FloatField()
+    cell_deg = models.FloatField()
+    width = models.IntegerField()
+    height = models.IntegerField()
+    site_count = models.IntegerField()
+    snow_depth = models.BinaryField()
+    new_snow = models.BinaryField()
+
+    class Meta:
+        get_latest_by = 'computed_at'
+
+    def __str__(self):
+        return f"Snow grid at {self.computed_at}"
+
+
+class AlertRule(models.Model):
+    """
+    Model describing a threshold alert on site observations, delivered to a webhook.
+
+    A rule fires when its metric crosses the threshold at a site (for every site if
+    `snotel_site` is empty), and fires again only after the metric has gone back
+    across it.
+    """
+    NEW_SNOW_24H = 'new_snow_24h'
+    SNOW_DEPTH = 'snow_depth'
+    TEMP = 'temp'
+    METRIC_CHOICES = [
+        (NEW_SNOW_24H, 'New snow in 24h (in)'),
+        (SNOW_DEPTH, 'Snow depth (in)'),
+        (TEMP, 'Temperature (F)'),
+    ]
+    ABOVE = 'above'
+    BELOW = 'below'
+    COMPARISON_CHOICES = [(ABOVE, 'Above'), (BELOW, 'Below')]
+
+    name = models.CharField(max_length=100)
+    snotel_site = models.ForeignKey(SnotelSite, null=True, blank=True, on_delete=models.CASCADE)
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)
+    comparison = models.CharField(max_length=10, choices=COMPARISON_CHOICES, default=ABOVE)
+    threshold = models.FloatField()
+    webhook_url = models.URLField(max_length=500)
+    enabled = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def matches(self, value):
+        if self.comparison == self.ABOVE:
+            return value > self.threshold
+        return value < self.threshold
+
+    def __str__(self):
+        return f"{self.name}: {self.metric} {self.comparison} {self.threshold}"
+
+
+class SiteAlertState(models.Model):
+    """
+    Model holding the rolling state the alert evaluator keeps for each site.
+
+    `last_timestamp` is the newest observation evaluated. `window` holds the last
+    24 hours of snow depths as [epoch, depth] pairs, plus the latest reading before
+    them as the 24h baseline. `active_rules` lists the IDs of rules whose condition
+    currently holds, so they don't fire again.
+    """
+    snotel_site = models.OneToOneField(SnotelSite, primary_key=True, on_delete=models.CASCADE)
+    last_timestamp = models.DateTimeField(null=True)
+    window = models.JSONField(default=list)
+    active_rules = models.JSONField(default=list)
+
+    def __str__(self):
+        return f"Alert state for {self.snotel_site_id} at {self.last_timestamp}"
+
+
+class AlertOutbox(models.Model):
+    """
+    Model queueing a fired alert until the `deliver_alerts` worker sends it.
+    """
+    PENDING = 'pending'
+    DELIVERED = 'delivered'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (DELIVERED, 'Delivered'), (FAILED, 'Failed')]
+
+    rule = models.ForeignKey(AlertRule, on_delete=models.CASCADE)
+    snotel_site = models.ForeignKey(SnotelSite, on_delete=models.CASCADE)
+    observed_at = models.DateTimeField()
+    value = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # Serves the delivery worker's scan for due alerts without touching delivered ones.
+            models.Index(fields=['next_attempt_at'], condition=models.Q(status='pending'), name='alertoutbox_pending'),
+        ]
 
     def __str__(self):
-        return f"SNOTEL Data for {self.snotel_site.site_id} at {self.timestamp}"
+        return f"{self.rule.name} at {self.snotel_site_id} ({self.status})"
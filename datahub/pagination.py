@@ -0,0 +1,71 @@
+import base64
+import binascii
+import json
+
+
+class InvalidPage(ValueError):
+    pass
+
+
+def encode_cursor(position):
+    """
+    Encodes a keyset position as an opaque, URL-safe cursor.
+
+    Args:
+        position (dict): The values the next page continues after.
+
+    Returns:
+        str: The cursor.
+    """
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, keys):
+    """
+    Decodes a cursor from `encode_cursor`.
+
+    Args:
+        cursor (str): The cursor from the request.
+        keys (tuple): Keys the position must contain.
+
+    Returns:
+        dict: The position.
+
+    Raises:
+        InvalidPage: If the cursor is malformed.
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidPage('Invalid cursor')
+    if not isinstance(position, dict) or any(key not in position for key in keys):
+        raise InvalidPage('Invalid cursor')
+    return position
+
+
+def page_limit(request, default, maximum):
+    """
+    Reads the `limit` query parameter, capped at `maximum`.
+
+    Raises:
+        InvalidPage: If the limit is not a positive integer.
+    """
+    try:
+        limit = int(request.GET.get('limit', default))
+    except ValueError:
+        raise InvalidPage('Invalid limit')
+    if limit < 1:
+        raise InvalidPage('Invalid limit')
+    return min(limit, maximum)
+
+
+def next_link(request, cursor):
+    """
+    Builds the URL of the next page, keeping the request's other query parameters.
+
+    Returns:
+        str: The absolute URL, for a `Link: <url>; rel="next"` header.
+    """
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
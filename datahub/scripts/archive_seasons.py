@@ -0,0 +1,44 @@
+import logging
+from django.conf import settings
+from datahub.cold_storage import cold_storage, season_bounds
+from datahub.models import SnotelData
+
+logger = logging.getLogger('testlogger')
+
+
+def run(*args):
+    """
+    Archives closed seasons of observations from SnotelData into Parquet cold storage.
+
+    Without 'purge' nothing moves: the rows stay in SnotelData and the archives are
+    a copy, rewritten only for seasons that gained rows since the last run.
+
+    Usage: python manage.py runscript archive_seasons --script-args keep=1 purge dry-run
+
+    Args:
+        args: 'keep=N' skips the N most recent closed seasons (default
+            COLD_STORAGE_KEEP_SEASONS); 'purge' deletes the archived rows from
+            SnotelData (default COLD_STORAGE_PURGE); 'dry-run' only lists what would move.
+    """
+    options = dict(arg.split('=', 1) for arg in args if '=' in arg)
+    keep = int(options.get('keep', settings.COLD_STORAGE_KEEP_SEASONS))
+    purge = 'purge' in args or settings.COLD_STORAGE_PURGE
+    dry_run = 'dry-run' in args
+
+    total = 0
+    for season in cold_storage.closed_seasons(keep):
+        start, end = season_bounds(season)
+        rows = SnotelData.objects.filter(timestamp__gte=start, timestamp__lt=end)
+        if dry_run:
+            print(f"season {season}: {rows.count()} rows")
+            continue
+        site_ids = rows.values_list('snotel_site_id', flat=True).distinct()
+        moved = sum(cold_storage.archive(site_id, season, purge=purge) for site_id in list(site_ids))
+        logger.info("Archived %s rows for season %s", moved, season)
+        total += moved
+
+    if not dry_run:
+        if purge:
+            print(f"Archived {total} rows and purged them from the database")
+        else:
+            print(f"Copied {total} rows to cold storage; they stay in the database until run with 'purge'")
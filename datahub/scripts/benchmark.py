@@ -0,0 +1,170 @@
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.test import RequestFactory
+from datahub.models import SnotelSite, SnotelData, UpstreamResponse
+from datahub.scripts.datahub import SnotelDataFetcher
+from datahub.scripts.db_manager import DatabaseManager
+from datahub.scripts.fake_upstream import FakeUpstream
+from datahub.scripts.synthetic import generate_sites, generate_observations
+from datahub.views import AllStationsView, StationView
+
+
+DEFAULTS = {'sites': 50, 'hours': 96, 'repeat': 5}
+
+
+def _parse_args(args):
+    options = dict(DEFAULTS)
+    compare = None
+    for arg in args:
+        key, _, value = arg.partition('=')
+        if key == 'compare':
+            compare = value
+        elif key in options:
+            options[key] = int(value)
+        else:
+            raise ValueError(f"Unknown benchmark option '{arg}', expected one of {list(DEFAULTS)} or compare=<file>")
+    return options, compare
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=settings.BASE_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def _summary(samples):
+    return {
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.fmean(samples),
+        'runs': len(samples),
+    }
+
+
+class Benchmark:
+    """
+    Times the ingest and API hot paths against synthetic data.
+
+    Synthetic sites use the 'BENCH' network code and are removed when the run
+    finishes, so the benchmark can be pointed at a development database.
+
+    Attributes:
+        sites (pd.DataFrame): The synthetic sites.
+        observations (pd.DataFrame): Synthetic hourly rows for every site.
+        results (dict): Timing summaries keyed by benchmark name.
+    """
+
+    def __init__(self, n_sites, n_hours, repeat):
+        self.n_sites = n_sites
+        self.n_hours = n_hours
+        self.repeat = repeat
+        self.sites = generate_sites(n_sites)
+        self.observations = generate_observations(self.sites, n_hours)
+        self.db_manager = DatabaseManager()
+        self.factory = RequestFactory()
+        self.results = {}
+
+    def _time(self, name, func, repeat=None, setup=None):
+        samples = []
+        for _ in range(repeat or self.repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+        self.results[name] = _summary(samples)
+
+    def _cleanup(self):
+        site_ids = list(self.sites['site_id'])
+        SnotelData.objects.filter(snotel_site_id__in=site_ids).delete()
+        SnotelSite.objects.filter(site_id__in=site_ids).delete()
+
+    def bench_db(self):
+        self._time('insert_snotel_sites', lambda: self.db_manager.insert_snotel_sites(self.sites),
+                   repeat=1, setup=self._cleanup)
+        self._time('insert_snotel_data', lambda: self.db_manager.insert_snotel_data(self.observations),
+                   setup=lambda: SnotelData.objects.filter(snotel_site_id__in=list(self.sites['site_id'])).delete())
+        self._time('insert_snotel_data_duplicates', lambda: self.db_manager.insert_snotel_data(self.observations))
+
+    def bench_fetch(self):
+        stage_samples = {}
+        with FakeUpstream(sites=self.sites) as upstream:
+            for _ in range(self.repeat):
+                fetcher = SnotelDataFetcher(base_url=upstream.base_url)
+                fetcher.get_all_sites(add_to_db=False, state_list=list(self.sites['state_code'].unique()))
+                start = time.perf_counter()
+                asyncio.run(fetcher.get_all_site_data(add_to_db=False, offset_hrs=self.n_hours))
+                stage_samples.setdefault('get_all_site_data', []).append(time.perf_counter() - start)
+                for stage, seconds in fetcher.metrics.stage_seconds.items():
+                    stage_samples.setdefault(f'get_all_site_data.{stage}', []).append(seconds)
+            UpstreamResponse.objects.filter(url__startswith=upstream.base_url).delete()
+        for name, samples in stage_samples.items():
+            self.results[name] = _summary(samples)
+
+    def bench_views(self):
+        list_view = async_to_sync(AllStationsView.as_view())
+        detail_view = async_to_sync(StationView.as_view())
+        site_id = self.sites['site_id'].iloc[0]
+        self._time('AllStationsView', lambda: list_view(self.factory.get('/api/stations/')))
+        self._time('StationView',
+                   lambda: detail_view(self.factory.get(f'/api/station/{site_id}/',
+                                                        {'time_offset_hrs': self.n_hours}), pk=site_id))
+
+    def run(self):
+        try:
+            self.bench_db()
+            self.bench_fetch()
+            self.bench_views()
+        finally:
+            self._cleanup()
+        return self.results
+
+
+def _print_results(results, baseline=None):
+    print(f"{'benchmark':45} {'median (ms)':>12} {'min (ms)':>10}" + (f" {'vs base':>9}" if baseline else ''))
+    for name, summary in results.items():
+        line = f"{name:45} {summary['median'] * 1000:12.2f} {summary['min'] * 1000:10.2f}"
+        if baseline and name in baseline:
+            change = summary['median'] / baseline[name]['median'] - 1
+            line += f" {change:+9.1%}"
+        print(line)
+
+
+def run(*args):
+    """
+    Runs the benchmark suite and stores the results for comparison between commits.
+
+    Usage: python manage.py runscript benchmark --script-args sites=50 hours=96 repeat=5 compare=<results.json>
+
+    Results are written to BENCHMARK_RESULTS_DIR as '<commit>-<timestamp>.json'.
+    """
+    options, compare = _parse_args(args)
+    results = Benchmark(options['sites'], options['hours'], options['repeat']).run()
+
+    commit = _git_commit()
+    record = {
+        'commit': commit,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'options': options,
+        'results': results,
+    }
+    os.makedirs(settings.BENCHMARK_RESULTS_DIR, exist_ok=True)
+    path = os.path.join(settings.BENCHMARK_RESULTS_DIR, f"{commit}-{datetime.now():%Y%m%dT%H%M%S}.json")
+    with open(path, 'w') as f:
+        json.dump(record, f, indent=2)
+
+    baseline = None
+    if compare:
+        with open(compare) as f:
+            baseline = json.load(f)['results']
+    _print_results(results, baseline)
+    print(f"Results written to {path}")
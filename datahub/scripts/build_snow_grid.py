@@ -0,0 +1,10 @@
+from datahub.snow_grid import compute_snow_grid
+
+
+def run(*args):
+    """
+    Recomputes the snow-depth grid from the latest site readings outside of an ingest.
+    """
+    grid = compute_snow_grid()
+    if grid is not None:
+        print(f"Computed a {grid.width}x{grid.height} grid from {grid.site_count} sites")
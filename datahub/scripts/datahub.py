@@ -1,12 +1,20 @@
 import logging
 import pandas as pd
 from io import StringIO
-import requests
 import aiohttp
 import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from asgiref.sync import sync_to_async
 from datahub.scripts.db_manager import DatabaseManager
+from datahub.alerts import AlertEvaluator
+from datahub.snow_grid import compute_snow_grid
+from datahub.scripts.metrics import IngestMetrics
+from datahub.scripts.response_cache import CachedResponse, ResponseCache, content_hash
 from aiohttp import ClientError
 from datetime import datetime, timedelta
+from django.conf import settings
 from pytz import timezone
 
 
@@ -15,6 +23,51 @@ HEADERS = {
     'Accept-Language': 'en-US,en;q=0.9',
     'Accept-Encoding': 'gzip, deflate, br',
 }
+# aiohttp negotiates the encodings it can decode itself.
+AIOHTTP_HEADERS = {k: v for k, v in HEADERS.items() if k != 'Accept-Encoding'}
+
+SITE_LIST_PATH = '/customMultipleStationReport/daily/network=%22SNTL%22,%22SCAN%22,%22MSNT%22%20AND%20element=%22WTEQ%22%20AND%20outServiceDate=%222100-01-01%22%7Cname/0,0/stationId,state.code,network.code,name,elevation,latitude,longitude,county.name,huc12.huc,huc12.hucName,inServiceDate,outServiceDate?fitToScreen=false'
+SITE_DATA_PATH = '/customSingleStationReport/hourly/'
+LOCAL_TIMEZONE = timezone('America/Denver')
+TEMP_COLUMN = 'Air Temperature Observed (degF)'
+SNOW_DEPTH_COLUMN = 'Snow Depth (in)'
+
+
+def parse_site_csv(data, site_id):
+    """
+    Parses a site's hourly report CSV into rows ready for `insert_snotel_data`.
+
+    This is a module-level function so it can be dispatched to a process pool.
+
+    Args:
+        data (str): The raw CSV text, including the report's '#' comment header.
+        site_id (str): The site ID.
+
+    A report without a temperature or snow depth column (e.g. a site without that
+    sensor) gets nulls for it.
+
+    Returns:
+        tuple: The parsed pd.DataFrame with 'snotel_site_id', 'temp', 'snow_depth' and
+            'timestamp' columns, and the seconds spent parsing.
+
+    Raises:
+        ValueError: If the body is empty or is not a report CSV (e.g. an HTML error page).
+    """
+    start = time.perf_counter()
+    lines = [line for line in data.split('\n') if not line.startswith('#')]
+    clean_text = '\n'.join(lines)
+    df = pd.read_csv(StringIO(clean_text))
+    if 'Date' not in df.columns:
+        raise ValueError(f"no Date column in report, got {list(df.columns)[:5]}")
+    df = df.reindex(columns=['Date', TEMP_COLUMN, SNOW_DEPTH_COLUMN])
+    df = pd.DataFrame({
+        'snotel_site_id': site_id,
+        'temp': df[TEMP_COLUMN],
+        'snow_depth': df[SNOW_DEPTH_COLUMN],
+        'timestamp': pd.to_datetime(df['Date'], errors='coerce').dt.tz_localize(LOCAL_TIMEZONE),
+    })
+    return df.dropna(subset=['timestamp']), time.perf_counter() - start
+
 
 class SnotelDataFetcher:
     """
@@ -26,166 +79,337 @@ class SnotelDataFetcher:
 
     Attributes:
         db_manager (DatabaseManager): The instance of the DatabaseManager class.
+        metrics (IngestMetrics): Stage timings and counters for the current run.
+        base_url (str): Base URL of the USDA report generator CSV endpoints.
+        response_cache (ResponseCache): Database cache of upstream response validators and hashes.
+        parse_executor (str): Where CSV parsing runs: 'process', 'thread' or 'inline'.
+        parse_workers (int): Size of the parse pool, or None for one per CPU.
+        max_connections (int): Maximum concurrent connections to the upstream.
 
     """
 
-    def __init__(self):
+    def __init__(self, base_url=None, parse_executor=None, parse_workers=None,
+                 max_connections=None):
         self.logger = logging.getLogger('testlogger')
+        self.base_url = base_url or settings.SNOTEL_REPORT_BASE_URL
+        self.parse_executor = parse_executor or settings.SNOTEL_PARSE_EXECUTOR
+        self.parse_workers = parse_workers or settings.SNOTEL_PARSE_WORKERS or None
+        self.max_connections = max_connections or settings.SNOTEL_HTTP_CONNECTIONS
+        self._executor = None
         self.db_manager = DatabaseManager()
+        self.metrics = IngestMetrics()
+        self.response_cache = ResponseCache()
+        self._pending_responses = []
         self.all_sites = None
 
-    async def _fetch_data(self, session, url):
+    async def _fetch_data(self, session, url, cached=None):
         """
         Fetches data from the specified URL using the provided session.
 
+        If the URL has been fetched before, the request is made conditional on the
+        cached ETag/Last-Modified, and the new body is compared with the cached
+        one by content hash.
+
         Args:
             session (aiohttp.ClientSession): The aiohttp ClientSession object.
             url (str): The URL to fetch the data from.
+            cached (CachedResponse): The URL's cached response, if any.
 
         Returns:
-            str: The fetched data as text.
+            tuple: The response as a CachedResponse, and whether its content changed
+                since it was last cached.
         """
-        async with session.get(url) as response:
-            return await response.text()
+        headers = cached.conditional_headers() if cached is not None else {}
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304 and cached is not None:
+                cached.fetched_at = time.time()
+                return cached, False
+            response.raise_for_status()
+            body = await response.text()
+            fetched = CachedResponse(url, body, content_hash(body),
+                                     response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return fetched, cached is None or cached.content_hash != fetched.content_hash
 
-    async def _get_data(self, id, start_date=None, end_date=None):
+    def _site_url(self, id, start_date=None, end_date=None):
+        trimmed_id = id.replace('SNOTEL:', '').replace('_', ':')
+        base_url = self.base_url + SITE_DATA_PATH
+        return f"{base_url}start_of_period/{trimmed_id}%7Cid=%22%22%7Cname/{start_date},{end_date}/WTEQ::value,SNWD::value,PREC::value,TOBS::value"
+
+    async def _get_data(self, session, id, start_date=None, end_date=None, cached=None):
         """
         Retrieves SNOTEL data for a specific site.
 
         Args:
+            session (aiohttp.ClientSession): The aiohttp ClientSession object.
             id (str): The site ID.
             start_date (str): The start date for data retrieval.
             end_date (str): The end date for data retrieval.
+            cached (CachedResponse): The site report's cached response, if any.
 
         Returns:
-            pd.DataFrame: The retrieved SNOTEL data as a DataFrame.
+            pd.DataFrame: The retrieved SNOTEL data as a DataFrame ready for insertion,
+                or None if the fetch failed or the data is unchanged since the last ingest.
         """
-        trimmed_id = id.replace('SNOTEL:', '').replace('_', ':')
-        base_url = "https://wcc.sc.egov.usda.gov/reportGenerator/view_csv/customSingleStationReport/hourly/"
-        url = f"{base_url}start_of_period/{trimmed_id}%7Cid=%22%22%7Cname/{start_date},{end_date}/WTEQ::value,SNWD::value,PREC::value,TOBS::value"
+        url = self._site_url(id, start_date, end_date)
 
-        async with aiohttp.ClientSession() as session:
-            try:
-                data = await self._fetch_data(session, url)
-                lines = [line for line in data.split('\n') if not line.startswith('#')]
-                clean_text = '\n'.join(lines)
-                df = pd.read_csv(StringIO(clean_text))
-                df['site_id'] = id
-                return df
-            except (aiohttp.ClientError, aiohttp.ServerTimeoutError) as e:
-                self.logger.error("An error occurred while fetching SNOTEL data for site %s: %s", id, str(e))
-                return None
+        fetch_start = time.perf_counter()
+        try:
+            response, changed = await self._fetch_data(session, url, cached)
+        except (aiohttp.ClientError, aiohttp.ServerTimeoutError) as e:
+            self.logger.error("An error occurred while fetching SNOTEL data for site %s: %s", id, str(e))
+            self.metrics.record_fetch(id, time.perf_counter() - fetch_start, 0, ok=False)
+            return None
+        fetch_seconds = time.perf_counter() - fetch_start
+        data = response.body
+
+        # Cached once the data is in the database, so a failed merge is retried next run.
+        self._pending_responses.append(response)
+        if not changed:
+            self.metrics.record_fetch(id, fetch_seconds, len(data.encode()))
+            self.metrics.incr('sites_unchanged')
+            return None
 
-    async def _get_snotel_data(self, site_ids, start_date=None, end_date=None):
+        # Parsing is CPU bound, so it runs off the event loop to keep other fetches moving.
+        loop = asyncio.get_running_loop()
+        try:
+            df, parse_seconds = await loop.run_in_executor(self._executor, parse_site_csv, data, id)
+        except Exception as e:
+            # One malformed report (an empty body, an HTML error page) must not abort the whole ingest.
+            self.logger.error("Could not parse SNOTEL data for site %s: %s", id, str(e))
+            self.metrics.record_fetch(id, fetch_seconds, len(data.encode()), ok=False)
+            self._pending_responses.remove(response)
+            return None
+        self.metrics.add_time('parse', parse_seconds)
+        self.metrics.record_fetch(id, fetch_seconds, len(data.encode()), len(df))
+        return df
+
+    async def _get_snotel_data(self, site_ids, start_date=None, end_date=None, on_batch=None):
         """
         Retrieves SNOTEL data for multiple sites.
 
+        Sites are handled as they complete, over one connection pool of at most
+        `max_connections` connections. If `on_batch` is given, parsed sites are
+        grouped into batches of about SNOTEL_INSERT_BATCH_ROWS rows and handed to it
+        while the remaining sites are still downloading.
+
         Args:
             site_ids (list): List of site IDs.
             start_date (str): The start date for data retrieval.
             end_date (str): The end date for data retrieval.
+            on_batch (coroutine function): Optional callback awaited with each batch DataFrame.
 
         Returns:
-            pd.DataFrame: The retrieved SNOTEL data as a DataFrame.
+            pd.DataFrame: The retrieved SNOTEL data as a DataFrame, or None if no
+                site has new data.
         """
         tasks = []
-        async with aiohttp.ClientSession() as session:
+        results = []
+        batch = []
+        batch_rows = 0
+        writes = []
+        urls = {site_id: self._site_url(site_id, start_date, end_date) for site_id in site_ids}
+        cached = await sync_to_async(self.response_cache.get_many)(list(urls.values()))
+        connector = aiohttp.TCPConnector(limit=self.max_connections)
+        async with aiohttp.ClientSession(connector=connector) as session:
             for site_id in site_ids:
-                task = asyncio.create_task(self._get_data(site_id, start_date, end_date))
+                task = asyncio.create_task(self._get_data(session, site_id, start_date, end_date,
+                                                          cached.get(urls[site_id])))
                 tasks.append(task)
 
-            results = await asyncio.gather(*tasks)
+            for task in asyncio.as_completed(tasks):
+                df = await task
+                if df is None:
+                    continue
+                results.append(df)
+                batch.append(df)
+                batch_rows += len(df)
+                if on_batch is not None and batch_rows >= settings.SNOTEL_INSERT_BATCH_ROWS:
+                    writes.append(asyncio.create_task(on_batch(pd.concat(batch, ignore_index=True))))
+                    batch, batch_rows = [], 0
+
+            if on_batch is not None and batch:
+                writes.append(asyncio.create_task(on_batch(pd.concat(batch, ignore_index=True))))
+            await asyncio.gather(*writes)
+
+            if not results:
+                return None
             df = pd.concat(results, ignore_index=True)
 
             return df
 
+    def _make_executor(self):
+        """
+        Creates the pool CSV parsing is dispatched to, per `parse_executor`.
+
+        Returns:
+            concurrent.futures.Executor: The pool, or None to parse on the event loop's default thread pool.
+        """
+        if self.parse_executor == 'process':
+            return ProcessPoolExecutor(max_workers=self.parse_workers)
+        if self.parse_executor == 'thread':
+            return ThreadPoolExecutor(max_workers=self.parse_workers)
+        return None
+
+    async def _fetch_site_list(self):
+        """
+        Fetches the multi-network station list, reusing the cached copy while it is
+        younger than SNOTEL_SITE_LIST_TTL_SECONDS.
+
+        Returns:
+            CachedResponse: The station list response.
+        """
+        url = self.base_url + SITE_LIST_PATH
+        cached = await sync_to_async(self.response_cache.get)(url)
+        if cached is not None and cached.is_fresh(settings.SNOTEL_SITE_LIST_TTL_SECONDS):
+            self.logger.info("Using cached SNOTEL site list")
+            return cached
+
+        async with aiohttp.ClientSession(headers=AIOHTTP_HEADERS) as session:
+            response, _ = await self._fetch_data(session, url, cached)
+        await sync_to_async(self.response_cache.put)(response, keep_body=True)
+        return response
+
+    def _commit_responses(self):
+        """
+        Caches the responses whose data has been merged into the database.
+        """
+        self.response_cache.put_many(self._pending_responses)
+        self._pending_responses = []
+        self.response_cache.prune(settings.SNOTEL_RESPONSE_CACHE_MAX_AGE_SECONDS)
+
     def get_all_sites(self, add_to_db, state_list=['CO']):
         """
         Fetches data for all SNOTEL sites.
 
         This method retrieves data for all SNOTEL sites from an external service.
-        It then processes and returns the site data in a list format.
+        It then processes and returns the site data in a list format. The station
+        list is fetched asynchronously and cached for SNOTEL_SITE_LIST_TTL_SECONDS.
 
         Args:
             add_to_db (bool): If True, the site data will be added to the database.
-            state_list (list): List of state codes to filter the SNOTEL sites (default: ['CO']).
+            state_list (list): List of state codes to filter the SNOTEL sites (default: ['CO']),
+                or None for every state.
 
         Returns:
             list: A list containing the site data.
         """
         try:
-            r = requests.get('https://wcc.sc.egov.usda.gov/reportGenerator/view_csv/customMultipleStationReport/daily/network=%22SNTL%22,%22SCAN%22,%22MSNT%22%20AND%20element=%22WTEQ%22%20AND%20outServiceDate=%222100-01-01%22%7Cname/0,0/stationId,state.code,network.code,name,elevation,latitude,longitude,county.name,huc12.huc,huc12.hucName,inServiceDate,outServiceDate?fitToScreen=false', 
-                             headers=HEADERS)
-            r.raise_for_status()
-            data = r.text
+            with self.metrics.stage('sites_fetch'):
+                data = asyncio.run(self._fetch_site_list()).body
             if len(data) <1:
-                self.logger.debug(r.text)
-            lines = [line for line in data.split('\n') if not line.startswith('#')]
-            clean_text = '\n'.join(lines)
-            df = pd.read_csv(StringIO(clean_text))
+                self.logger.debug(data)
+            with self.metrics.stage('sites_parse'):
+                lines = [line for line in data.split('\n') if not line.startswith('#')]
+                clean_text = '\n'.join(lines)
+                df = pd.read_csv(StringIO(clean_text))
             df.columns = [c.replace(' ', '_') for c in df.columns]
             df['site_id'] = 'SNOTEL:' + df['Station_Id'].astype(str) + '_' + df['State_Code'] + '_' + df['Network_Code']
             df['name'] = df['Station_Name']
             df['lat'] = df['Latitude']
             df['lon'] = df['Longitude']
             df['elevation_ft'] = df['Elevation']
-            df = df[df['State_Code'].isin(state_list)]
-            df = df.loc[:, ['site_id', 'name', 'lat', 'lon', 'elevation_ft']]
+            df['state_code'] = df['State_Code']
+            df['network_code'] = df['Network_Code']
+            if state_list is not None:
+                df = df[df['State_Code'].isin(state_list)]
+            df = df.loc[:, ['site_id', 'name', 'lat', 'lon', 'elevation_ft', 'state_code', 'network_code']]
             self.all_sites = df
 
-        except (requests.RequestException, ValueError) as e:
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
             self.logger.error("An error occurred while fetching SNOTEL site data: %s", str(e))
             return []
 
         if add_to_db:
-            self.db_manager.insert_snotel_sites(self.all_sites)
+            self.db_manager.insert_snotel_sites(self.all_sites, metrics=self.metrics)
 
     async def get_all_site_data(self,
                                 add_to_db,
                                 offset_hrs=200,
-                                retry_attempts=3):
+                                retry_attempts=3,
+                                save_run=True):
         """
         Fetches data for all SNOTEL sites.
 
         This method retrieves data for all SNOTEL sites by calling the `_get_snotel_data` method.
-        It returns a DataFrame containing all the site data.
+        It returns a DataFrame containing all the site data. Sites whose upstream
+        response is unchanged since the last ingest are skipped before parsing.
+        Parsing runs in a process (or thread) pool, and when adding to the database
+        parsed sites are inserted in batches on a single writer thread while other
+        sites are still downloading. The run is then finished with `finish_run`
+        unless `save_run` is False, e.g. for one shard of a larger run.
 
         Args:
             add_to_db (bool): If True, the retrieved data will be added to the database.
             offset_hrs (int): The number of hours to go back from the current time
                 to retrieve site data.
             retry_attempts (int): The number of retry attempts in case of errors.
+            save_run (bool): If False, leave the snow grid and IngestRun to the caller.
 
         Returns:
-            pd.DataFrame: A DataFrame containing the site data.
+            pd.DataFrame: A DataFrame containing the site data, or None if nothing changed.
         """
         current_date = datetime.now()
         start_date = current_date - timedelta(hours=offset_hrs)
         end_date = current_date.strftime("%Y-%m-%d")
         start_date = start_date.strftime("%Y-%m-%d")
         self.logger.info(f'running for {start_date} to {end_date}')
-        retry_count = 0
-        while retry_count < retry_attempts:
-            try:
-                all_site_data = await self._get_snotel_data(self.all_sites['site_id'], start_date, end_date)
-                break
-            except (aiohttp.ClientError, aiohttp.ServerTimeoutError) as e:
-                self.logger.error("An error occurred while fetching SNOTEL site data: %s", str(e))
-                retry_count += 1
-                if retry_count < retry_attempts:
-                    self.logger.info("Retrying after 3 seconds...")
-                    await asyncio.sleep(3)
-                else:
-                    self.logger.error("Exceeded retry attempts. Unable to fetch SNOTEL site data.")
-                    return None
-
-        all_site_data['timestamp'] = all_site_data['Date'].apply(lambda x: pd.to_datetime(x).tz_localize(timezone('America/Denver')))
-        all_site_data['snow_depth'] = all_site_data['Snow Depth (in)']
-        all_site_data['temp'] = all_site_data['Air Temperature Observed (degF)']
-        all_site_data['snotel_site_id'] = all_site_data['site_id']
-        all_site_data = all_site_data.loc[:,['snotel_site_id','temp','snow_depth','timestamp']]
-        
-        if add_to_db and all_site_data is not None:
-            self.db_manager.insert_snotel_data(all_site_data)
+        self.metrics.incr('sites_requested', len(self.all_sites))
+
+        loop = asyncio.get_running_loop()
+        # One writer thread, so batches share the temp table in turn and never block the event loop.
+        db_writer = ThreadPoolExecutor(max_workers=1) if add_to_db else None
+
+        # Alert rules are checked against just the rows each batch inserts.
+        on_inserted = AlertEvaluator().evaluate if add_to_db and settings.ALERTS_ENABLED else None
+
+        async def write_batch(batch_df):
+            insert = partial(self.db_manager.insert_snotel_data, batch_df, metrics=self.metrics,
+                             on_inserted=on_inserted)
+            await loop.run_in_executor(db_writer, insert)
+
+        self._executor = self._make_executor()
+        try:
+            retry_count = 0
+            while retry_count < retry_attempts:
+                try:
+                    with self.metrics.stage('fetch'):
+                        all_site_data = await self._get_snotel_data(self.all_sites['site_id'], start_date, end_date,
+                                                                    on_batch=write_batch if add_to_db else None)
+                    break
+                except (aiohttp.ClientError, aiohttp.ServerTimeoutError) as e:
+                    self.logger.error("An error occurred while fetching SNOTEL site data: %s", str(e))
+                    retry_count += 1
+                    if retry_count < retry_attempts:
+                        self.logger.info("Retrying after 3 seconds...")
+                        await asyncio.sleep(3)
+                    else:
+                        self.logger.error("Exceeded retry attempts. Unable to fetch SNOTEL site data.")
+                        return None
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+            if db_writer is not None:
+                db_writer.shutdown()
+
+        if all_site_data is None:
+            self.logger.info("No SNOTEL site data changed upstream, skipping merge.")
+
+        if add_to_db:
+            await sync_to_async(self._commit_responses)()
+            if save_run:
+                await sync_to_async(self.finish_run)()
 
         return all_site_data
+
+    def finish_run(self):
+        """
+        Recomputes the snow grid if the run inserted rows and saves the run as an IngestRun.
+
+        Returns:
+            IngestRun: The saved run.
+        """
+        if settings.SNOW_GRID_ENABLED and self.metrics.counters['rows_inserted']:
+            with self.metrics.stage('snow_grid'):
+                compute_snow_grid()
+        return self.metrics.save()
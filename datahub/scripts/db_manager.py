@@ -1,9 +1,13 @@
 from sqlalchemy import create_engine
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.sql import text
 from django.conf import settings
 import logging
+import os
 from django.db import transaction
+from datahub.events import notify_payloads
 from datahub.models import SnotelSite, SnotelData
+from datahub.scripts.metrics import IngestMetrics
 
 
 logger = logging.getLogger(__name__)
@@ -20,29 +24,38 @@ class DatabaseManager:
             f"{settings.DATABASES['default']['NAME']}"
         )
         self.engine = create_engine(connection_string)
+        # Per process, so concurrent ingest shards never share a staging table.
+        self.staging_table = f'temp_snotel_data_{os.getpid()}'
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.DEBUG)
 
 
-    def insert_snotel_data(self, data_df):
+    def insert_snotel_data(self, data_df, metrics=None, on_inserted=None):
         """
         Inserts SNOTEL data into the database.
 
         This method inserts the SNOTEL data into the database. It takes a DataFrame
         consisting of four columns: 'snotel_site', 'temp', 'snow_depth', and 'date_time'.
         The method inserts a new row for each data entry in the DataFrame, only if there
-        is no existing entry with the same 'snotel_site' and 'date_time'.
+        is no existing entry with the same 'snotel_site' and 'date_time'. Sites that got
+        new rows are announced with a NOTIFY on SNOTEL_NOTIFY_CHANNEL, which PostgreSQL
+        delivers to listeners once the insert commits. The inserted rows are then passed
+        to `on_inserted`, if given; an error there is logged rather than raised, since
+        the rows are already committed.
 
         Args:
             data_df (pandas.DataFrame): DataFrame containing SNOTEL data.
+            metrics (IngestMetrics): Optional collector for stage timings and row counts.
+            on_inserted (callable): Called with the inserted rows as (snotel_site_id, timestamp,
+                temp, snow_depth) tuples, e.g. `AlertEvaluator.evaluate`.
 
         Returns:
             int: The number of rows inserted.
         """
+        metrics = metrics or IngestMetrics()
 
         # Create a temporary table for batch insertion
-        temp_table_name = 'temp_snotel_data'
-        data_df.to_sql(temp_table_name, con=self.engine, if_exists='replace', index=False)
+        temp_table_name = self.staging_table
 
         # Perform the upsert logic using SQL
         sql = f"""
@@ -55,23 +68,60 @@ class DatabaseManager:
             FROM datahub_snoteldata AS sd
             WHERE sd.snotel_site_id = ss.site_id AND sd.timestamp = tsd.timestamp
         )
+        RETURNING snotel_site_id, timestamp, temp, snow_depth
         """
-        with self.engine.connect() as connection:
-            connection.execute(text(sql))
-            connection.commit()
-
-            # num_rows_inserted = connection.scalar()
-            # logger.info(f"Inserted {num_rows_inserted} rows of SNOTEL data.")
-
-        with self.engine.connect() as connection:
-            drop_table_sql = f"DROP TABLE IF EXISTS {temp_table_name}"
-            print(drop_table_sql)
-            connection.execute(text(drop_table_sql))
-            connection.commit()
-            logger.info(f"temp tbl dropped")
-
-
-    def insert_snotel_sites(self, sites_data):
+        # Rows for sites missing from datahub_snotelsite are dropped by the join, not duplicates.
+        known_sql = f"""
+        SELECT count(*) FROM {temp_table_name} AS tsd
+        INNER JOIN datahub_snotelsite AS ss ON tsd.snotel_site_id = ss.site_id
+        """
+        try:
+            with metrics.stage('db_load'):
+                data_df.to_sql(temp_table_name, con=self.engine, if_exists='replace', index=False)
+            with metrics.stage('db_merge'), self.engine.connect() as connection:
+                num_rows_known = connection.execute(text(known_sql)).scalar()
+                inserted = connection.execute(text(sql)).fetchall()
+                num_rows_inserted = len(inserted)
+                changed_sites = sorted({row.snotel_site_id for row in inserted})
+                for payload in notify_payloads(changed_sites):
+                    connection.execute(text("SELECT pg_notify(:channel, :payload)"),
+                                       {'channel': settings.SNOTEL_NOTIFY_CHANNEL, 'payload': payload})
+                connection.commit()
+                logger.info(f"Inserted {num_rows_inserted} rows of SNOTEL data for {len(changed_sites)} sites.")
+        finally:
+            # The staging table is a real table, so drop it even when the load or merge fails.
+            self._drop_staging_table()
+
+        metrics.incr('rows_inserted', num_rows_inserted)
+        metrics.incr('rows_duplicate', num_rows_known - num_rows_inserted)
+        if num_rows_known < len(data_df):
+            logger.warning(f"Skipped {len(data_df) - num_rows_known} rows of SNOTEL data for unknown sites.")
+
+        if on_inserted is not None and inserted:
+            with metrics.stage('alerts'):
+                try:
+                    on_inserted([tuple(row) for row in inserted])
+                except Exception as e:
+                    # The rows are already committed; keep ingesting and let the callback catch up later
+                    # (the alert evaluator replays them with each site's next batch).
+                    logger.error(f"Evaluating {num_rows_inserted} inserted rows failed: {e}")
+
+        return num_rows_inserted
+
+    def _drop_staging_table(self):
+        drop_table_sql = f"DROP TABLE IF EXISTS {self.staging_table}"
+        logger.debug(drop_table_sql)
+        try:
+            with self.engine.connect() as connection:
+                connection.execute(text(drop_table_sql))
+                connection.commit()
+        except SQLAlchemyError as e:
+            # Not fatal: the next batch from this process replaces the table.
+            logger.error(f"Could not drop {self.staging_table}: {e}")
+            return
+        logger.info(f"temp tbl dropped")
+
+    def insert_snotel_sites(self, sites_data, metrics=None):
         """
         Inserts SNOTEL sites into the database.
 
@@ -81,12 +131,14 @@ class DatabaseManager:
 
         Args:
             sites_data (list): List of dictionaries containing SNOTEL site data.
+            metrics (IngestMetrics): Optional collector for stage timings.
 
         Returns:
             int: The number of sites inserted.
         """
+        metrics = metrics or IngestMetrics()
         num_sites_inserted = 0
-        with transaction.atomic():
+        with metrics.stage('db_sites'), transaction.atomic():
             for ix, site_data in sites_data.iterrows():
                 site_id = site_data['site_id']
                 if not SnotelSite.objects.filter(site_id=site_id).exists():
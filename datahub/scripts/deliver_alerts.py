@@ -0,0 +1,27 @@
+import logging
+import time
+import requests
+from django.conf import settings
+from datahub.alerts import deliver_due_alerts
+
+logger = logging.getLogger('testlogger')
+
+
+def run(*args):
+    """
+    Drains the alert outbox, posting fired alerts to their webhooks.
+
+    python manage.py runscript deliver_alerts [--script-args once]
+
+    Runs until stopped, polling every ALERT_DELIVERY_POLL_SECONDS while the outbox
+    is empty; with `once` it exits as soon as nothing is due.
+    """
+    with requests.Session() as session:
+        while True:
+            sent = deliver_due_alerts(session)
+            if sent:
+                logger.info("Attempted %s alerts", sent)
+                continue
+            if 'once' in args:
+                return
+            time.sleep(settings.ALERT_DELIVERY_POLL_SECONDS)
@@ -0,0 +1,121 @@
+import asyncio
+import re
+import threading
+from urllib.parse import unquote
+from aiohttp import web
+from datahub.scripts.synthetic import generate_sites, site_list_csv, site_data_csv, forecast_periods
+
+
+SITE_DATA_RE = re.compile(r'start_of_period/(?P<triplet>[^|]+)\|.*?/(?P<start>\d{4}-\d{2}-\d{2}),(?P<end>\d{4}-\d{2}-\d{2})/')
+
+
+class FakeUpstream:
+    """
+    Local stand-in for the USDA report generator CSV endpoints and the NWS API.
+
+    Serves a synthetic station list, deterministic per-site hourly reports and
+    NWS points/hourly forecast responses on 127.0.0.1, from a background thread,
+    so ingest and forecasts can run without network access. Use it as a context
+    manager and pass `base_url` to `SnotelDataFetcher` or `NwsForecastFetcher`.
+
+    Attributes:
+        sites (pd.DataFrame): The synthetic sites served by the station list.
+        base_url (str): Base URL to use in place of SNOTEL_REPORT_BASE_URL and NWS_API_BASE_URL.
+        requests_served (int): Number of requests handled so far.
+    """
+
+    def __init__(self, sites=None, n_sites=50, port=0):
+        self.sites = sites if sites is not None else generate_sites(n_sites)
+        self.port = port
+        self.base_url = None
+        self.requests_served = 0
+        self._loop = None
+        self._runner = None
+        self._thread = None
+
+    async def _site_list(self, request):
+        self.requests_served += 1
+        return web.Response(text=site_list_csv(self.sites), content_type='text/csv')
+
+    async def _site_data(self, request):
+        self.requests_served += 1
+        match = SITE_DATA_RE.search(unquote(request.raw_path))
+        if match is None:
+            return web.Response(status=400, text='unrecognised report path')
+        return web.Response(text=site_data_csv(match['triplet'], match['start'], match['end']), content_type='text/csv')
+
+    async def _nws_points(self, request):
+        self.requests_served += 1
+        lat, lon = (float(v) for v in request.match_info['coords'].split(','))
+        # Roughly 2.5km cells, like the NWS grid.
+        grid_x, grid_y = int((lon + 180) * 40), int((lat + 90) * 40)
+        return web.json_response({'properties': {
+            'gridId': 'BOU',
+            'gridX': grid_x,
+            'gridY': grid_y,
+            'forecastHourly': f'{self.base_url}/gridpoints/BOU/{grid_x},{grid_y}/forecast/hourly',
+        }})
+
+    async def _nws_forecast(self, request):
+        self.requests_served += 1
+        grid_x = int(request.match_info['coords'].split(',')[0])
+        return web.json_response({'properties': {'periods': forecast_periods(seed=grid_x)}},
+                                 headers={'Cache-Control': 'public, max-age=3600'})
+
+    def _app(self):
+        app = web.Application()
+        app.router.add_get('/customMultipleStationReport/{tail:.*}', self._site_list)
+        app.router.add_get('/customSingleStationReport/{tail:.*}', self._site_data)
+        app.router.add_get('/points/{coords}', self._nws_points)
+        app.router.add_get('/gridpoints/{office}/{coords}/forecast/hourly', self._nws_forecast)
+        return app
+
+    def start(self):
+        started = threading.Event()
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._runner = web.AppRunner(self._app(), access_log=None)
+            self._loop.run_until_complete(self._runner.setup())
+            site = web.TCPSite(self._runner, '127.0.0.1', self.port)
+            self._loop.run_until_complete(site.start())
+            port = self._runner.addresses[0][1]
+            self.base_url = f'http://127.0.0.1:{port}'
+            started.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self._runner.cleanup())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=serve, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def run(*args):
+    """
+    Serves the fake upstream until interrupted, e.g. for a manual ingest run with
+    SNOTEL_REPORT_BASE_URL (and NWS_API_BASE_URL) pointed at it.
+
+    Args:
+        args: Optional number of synthetic sites and port.
+    """
+    n_sites = int(args[0]) if args else 50
+    port = int(args[1]) if len(args) > 1 else 8089
+    with FakeUpstream(n_sites=n_sites, port=port) as upstream:
+        print(f'Serving {n_sites} synthetic sites at {upstream.base_url} (Ctrl-C to stop)')
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
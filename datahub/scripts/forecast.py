@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import re
+from datetime import timedelta
+from email.utils import parsedate_to_datetime
+import aiohttp
+from django.conf import settings
+from django.utils import timezone
+from datahub.models import SnotelSite, ForecastGridpoint
+
+
+MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+class NwsForecastFetcher:
+    """
+    Fetches hourly forecasts from the NWS API and caches them per gridpoint.
+
+    The points lookup for a site is made once and stored as the site's
+    ForecastGridpoint. Hourly forecasts are cached on the gridpoint until the
+    expiry the NWS API advertises (or NWS_FORECAST_TTL_SECONDS if it sends none),
+    so sites that share a gridpoint share one upstream request.
+
+    Attributes:
+        base_url (str): Base URL of the NWS API.
+    """
+
+    def __init__(self, base_url=None):
+        self.logger = logging.getLogger('testlogger')
+        self.base_url = base_url or settings.NWS_API_BASE_URL
+        self.headers = {'User-Agent': settings.NWS_USER_AGENT, 'Accept': 'application/geo+json'}
+        self.default_ttl = timedelta(seconds=settings.NWS_FORECAST_TTL_SECONDS)
+
+    def _expires_at(self, response):
+        """
+        Works out when a response goes stale from its caching headers.
+        """
+        now = timezone.now()
+        match = MAX_AGE_RE.search(response.headers.get('Cache-Control', ''))
+        if match:
+            return now + timedelta(seconds=int(match.group(1)))
+        if 'Expires' in response.headers:
+            try:
+                return max(parsedate_to_datetime(response.headers['Expires']), now)
+            except (TypeError, ValueError):
+                pass
+        return now + self.default_ttl
+
+    async def _get_json(self, session, url):
+        async with session.get(url, headers=self.headers) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None), self._expires_at(response)
+
+    async def get_gridpoint(self, session, site):
+        """
+        Returns the site's gridpoint, looking it up from the NWS points API the first time.
+
+        Args:
+            session (aiohttp.ClientSession): The aiohttp ClientSession object.
+            site (SnotelSite): The site, with `forecast_gridpoint` selected.
+
+        Returns:
+            ForecastGridpoint: The site's gridpoint.
+        """
+        if site.forecast_gridpoint is not None:
+            return site.forecast_gridpoint
+
+        # The points API only accepts up to four decimal places.
+        points, _ = await self._get_json(session, f"{self.base_url}/points/{site.lat:.4f},{site.lon:.4f}")
+        properties = points['properties']
+        gridpoint, _ = await ForecastGridpoint.objects.aget_or_create(
+            grid_id=properties['gridId'],
+            grid_x=properties['gridX'],
+            grid_y=properties['gridY'],
+            defaults={'forecast_hourly_url': properties['forecastHourly']},
+        )
+        site.forecast_gridpoint = gridpoint
+        await site.asave(update_fields=['forecast_gridpoint'])
+        return gridpoint
+
+    async def refresh_gridpoint(self, session, gridpoint, force=False):
+        """
+        Refreshes a gridpoint's hourly forecast if it has expired.
+
+        Args:
+            session (aiohttp.ClientSession): The aiohttp ClientSession object.
+            gridpoint (ForecastGridpoint): The gridpoint to refresh.
+            force (bool): Refresh even if the cached forecast has not expired.
+
+        Returns:
+            ForecastGridpoint: The gridpoint with current periods.
+        """
+        if not force and gridpoint.periods is not None and gridpoint.expires_at > timezone.now():
+            return gridpoint
+
+        forecast, expires_at = await self._get_json(session, gridpoint.forecast_hourly_url)
+        gridpoint.periods = forecast['properties']['periods']
+        gridpoint.fetched_at = timezone.now()
+        gridpoint.expires_at = expires_at
+        await gridpoint.asave(update_fields=['periods', 'fetched_at', 'expires_at'])
+        return gridpoint
+
+    async def get_site_forecast(self, site):
+        """
+        Returns the hourly forecast for a site, from cache when it is still fresh.
+
+        If the NWS API fails and a stale forecast is cached, the stale forecast is
+        returned rather than nothing.
+
+        Args:
+            site (SnotelSite): The site, with `forecast_gridpoint` selected.
+
+        Returns:
+            ForecastGridpoint: The site's gridpoint with its periods.
+        """
+        # Bounded well under the router timeout, since a user's request is waiting on it.
+        timeout = aiohttp.ClientTimeout(total=settings.NWS_REQUEST_TIMEOUT_SECONDS)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            gridpoint = await self.get_gridpoint(session, site)
+            try:
+                return await self.refresh_gridpoint(session, gridpoint)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+                if gridpoint.periods is None:
+                    raise
+                self.logger.warning("Serving stale forecast for %s: %s", gridpoint, str(e))
+                return gridpoint
+
+    async def refresh_all(self, concurrency=8, force=False):
+        """
+        Prefetches forecasts for every site so site pages are served from cache.
+
+        Args:
+            concurrency (int): Maximum number of concurrent NWS requests.
+            force (bool): Refresh forecasts even if they have not expired.
+
+        Returns:
+            int: The number of gridpoints refreshed.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        timeout = aiohttp.ClientTimeout(total=30)
+
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async def gridpoint_for(site):
+                async with semaphore:
+                    try:
+                        return await self.get_gridpoint(session, site)
+                    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+                        self.logger.error("An error occurred while looking up the gridpoint for site %s: %s",
+                                          site.site_id, str(e))
+                        return None
+
+            async def refresh(gridpoint):
+                async with semaphore:
+                    try:
+                        await self.refresh_gridpoint(session, gridpoint, force=force)
+                        return True
+                    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+                        self.logger.error("An error occurred while fetching the forecast for %s: %s",
+                                          gridpoint, str(e))
+                        return False
+
+            sites = [site async for site in SnotelSite.objects.select_related('forecast_gridpoint')]
+            gridpoints = await asyncio.gather(*[gridpoint_for(site) for site in sites])
+            unique = {gridpoint.pk: gridpoint for gridpoint in gridpoints if gridpoint is not None}
+            results = await asyncio.gather(*[refresh(gridpoint) for gridpoint in unique.values()])
+
+        self.logger.info("Refreshed forecasts for %s of %s gridpoints", sum(results), len(unique))
+        return sum(results)
@@ -0,0 +1,77 @@
+import asyncio
+import statistics
+import time
+import aiohttp
+
+
+DEFAULTS = {'url': 'http://127.0.0.1:8000/api/stations/', 'concurrency': 50, 'duration': 30}
+
+
+def _parse_args(args):
+    options = dict(DEFAULTS)
+    for arg in args:
+        key, _, value = arg.partition('=')
+        if key not in options:
+            raise ValueError(f"Unknown load test option '{arg}', expected one of {list(DEFAULTS)}")
+        options[key] = value if key == 'url' else int(value)
+    return options
+
+
+async def _worker(session, url, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            async with session.get(url) as response:
+                await response.read()
+                if response.status >= 400:
+                    errors.append(response.status)
+                    continue
+        except aiohttp.ClientError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+async def load_test(url, concurrency, duration):
+    """
+    Keeps `concurrency` requests in flight against `url` for `duration` seconds.
+
+    Args:
+        url (str): The URL to request.
+        concurrency (int): Number of concurrent clients.
+        duration (int): Test length in seconds.
+
+    Returns:
+        dict: Throughput, latency percentiles (ms) and error count.
+    """
+    latencies, errors = [], []
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*[_worker(session, url, deadline, latencies, errors) for _ in range(concurrency)])
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'requests_per_second': len(latencies) / duration,
+        'p50_ms': quantiles[49] * 1000,
+        'p95_ms': quantiles[94] * 1000,
+        'p99_ms': quantiles[98] * 1000,
+    }
+
+
+def run(*args):
+    """
+    Measures concurrent throughput of a running server.
+
+    Usage: python manage.py runscript loadtest --script-args url=http://127.0.0.1:8000/api/station/<id>/?time_offset_hrs=2000 concurrency=50 duration=30
+
+    Run it once against `gunicorn funtel_prj.wsgi -c gunicorn.conf.py` with
+    GUNICORN_WORKER_CLASS=sync and once against the default ASGI config, with the
+    same WEB_CONCURRENCY, to compare throughput per dyno.
+    """
+    options = _parse_args(args)
+    result = asyncio.run(load_test(options['url'], options['concurrency'], options['duration']))
+    for key, value in result.items():
+        print(f"{key:20} {value:.1f}" if isinstance(value, float) else f"{key:20} {value}")
@@ -0,0 +1,171 @@
+import logging
+import time
+from contextlib import contextmanager
+from django.utils import timezone
+
+
+logger = logging.getLogger('testlogger')
+
+
+class IngestMetrics:
+    """
+    Collects per-stage timings and counters for a single ingest run.
+
+    Stages are timed with the `stage` context manager and accumulate, so a stage
+    entered several times (e.g. once per site) reports its total wall time.
+    Per-site fetch statistics are kept separately so slow upstream sites stand out.
+
+    Attributes:
+        started_at (datetime): When the run started.
+        stage_seconds (dict): Total seconds spent in each named stage.
+        counters (dict): Run-level counters such as rows parsed or inserted.
+        site_stats (dict): Per-site fetch latency, bytes and rows parsed.
+        shard_stats (dict): Per-shard wall time and counters, for a sharded run.
+    """
+
+    COUNTERS = ('sites_requested', 'sites_fetched', 'sites_failed', 'sites_unchanged', 'bytes_fetched',
+                'rows_parsed', 'rows_inserted', 'rows_duplicate')
+
+    def __init__(self):
+        self.started_at = timezone.now()
+        self.stage_seconds = {}
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        self.site_stats = {}
+        self.shard_stats = {}
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times the enclosed block and adds it to the named stage.
+
+        Args:
+            name (str): The stage name, e.g. 'fetch', 'parse' or 'db_merge'.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + elapsed
+
+    def add_time(self, name, seconds):
+        """
+        Adds time measured elsewhere, e.g. in a worker process, to the named stage.
+        """
+        self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+
+    def incr(self, counter, value=1):
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def record_fetch(self, site_id, seconds, num_bytes, rows=0, ok=True):
+        """
+        Records the outcome of fetching a single site's data.
+
+        Args:
+            site_id (str): The site ID.
+            seconds (float): Request latency in seconds.
+            num_bytes (int): Size of the response body.
+            rows (int): Number of rows parsed from the response.
+            ok (bool): False if the fetch failed.
+        """
+        self.site_stats[site_id] = {'latency_s': round(seconds, 4), 'bytes': num_bytes, 'rows': rows, 'ok': ok}
+        self.incr('sites_fetched' if ok else 'sites_failed')
+        self.incr('bytes_fetched', num_bytes)
+        self.incr('rows_parsed', rows)
+
+    def summary(self):
+        """
+        Returns the collected timings and counters as plain data, e.g. to send from a shard worker.
+        """
+        return {'stage_seconds': self.stage_seconds, 'counters': self.counters, 'site_stats': self.site_stats}
+
+    def merge(self, summary, shard=None, seconds=None):
+        """
+        Adds another collector's `summary` to this one.
+
+        Stage times are summed, so for shards run in parallel they are total work
+        rather than wall time; each shard's wall time is kept in `shard_stats`.
+
+        Args:
+            summary (dict): The result of `summary()`.
+            shard (str): Name of the shard the summary came from, if any.
+            seconds (float): The shard's wall time.
+        """
+        for name, stage_seconds in summary['stage_seconds'].items():
+            self.add_time(name, stage_seconds)
+        for counter, value in summary['counters'].items():
+            self.incr(counter, value)
+        self.site_stats.update(summary['site_stats'])
+        if shard is not None:
+            self.shard_stats[shard] = {'seconds': round(seconds or 0.0, 4), **summary['counters']}
+
+    def save(self):
+        """
+        Persists the run to the IngestRun table.
+
+        Returns:
+            IngestRun: The saved run.
+        """
+        from datahub.models import IngestRun
+
+        run = IngestRun.objects.create(
+            started_at=self.started_at,
+            finished_at=timezone.now(),
+            stage_seconds={k: round(v, 4) for k, v in self.stage_seconds.items()},
+            site_stats=self.site_stats,
+            shard_stats=self.shard_stats,
+            **self.counters,
+        )
+        logger.info("Ingest run %s: %s %s", run.pk, self.counters, run.stage_seconds)
+        return run
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(run):
+    """
+    Renders the latest ingest run in the Prometheus text exposition format.
+
+    Args:
+        run (IngestRun): The run to render, or None if no run has been recorded.
+
+    Returns:
+        str: The metrics text.
+    """
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ','.join(f'{k}="{_escape_label(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+    if run is None:
+        metric('funtel_ingest_runs_total', 'counter', 'Number of recorded ingest runs.', [({}, 0)])
+        return '\n'.join(lines) + '\n'
+
+    from datahub.models import IngestRun
+
+    metric('funtel_ingest_runs_total', 'counter', 'Number of recorded ingest runs.',
+           [({}, IngestRun.objects.count())])
+    metric('funtel_ingest_last_run_timestamp_seconds', 'gauge', 'Finish time of the last ingest run.',
+           [({}, run.finished_at.timestamp())])
+    metric('funtel_ingest_last_run_duration_seconds', 'gauge', 'Wall time of the last ingest run.',
+           [({}, run.duration_seconds)])
+    metric('funtel_ingest_last_run_stage_seconds', 'gauge', 'Seconds spent per stage in the last ingest run.',
+           [({'stage': stage}, seconds) for stage, seconds in sorted(run.stage_seconds.items())])
+    for counter in IngestMetrics.COUNTERS:
+        metric(f'funtel_ingest_last_run_{counter}', 'gauge', f'{counter.replace("_", " ").capitalize()} in the last ingest run.',
+               [({}, getattr(run, counter))])
+    metric('funtel_ingest_last_run_shard_seconds', 'gauge', 'Per-shard wall time in the last ingest run.',
+           [({'shard': shard}, stats.get('seconds', 0)) for shard, stats in sorted(run.shard_stats.items())])
+    metric('funtel_ingest_last_run_shard_failed', 'gauge', 'Whether each shard failed in the last ingest run.',
+           [({'shard': shard}, int('error' in stats)) for shard, stats in sorted(run.shard_stats.items())])
+    metric('funtel_ingest_last_run_site_fetch_seconds', 'gauge', 'Per-site fetch latency in the last ingest run.',
+           [({'site_id': site_id}, stats['latency_s']) for site_id, stats in sorted(run.site_stats.items())])
+    metric('funtel_ingest_last_run_site_fetch_bytes', 'gauge', 'Per-site response size in the last ingest run.',
+           [({'site_id': site_id}, stats['bytes']) for site_id, stats in sorted(run.site_stats.items())])
+    return '\n'.join(lines) + '\n'
@@ -1,10 +1,26 @@
-
 import datetime
+from django.conf import settings
 from datahub.scripts.datahub import SnotelDataFetcher
 from datahub.scripts.db_manager import DatabaseManager
+from datahub.scripts.sharded_ingest import ShardedIngest
 import asyncio
 
+
+def state_list_from(states):
+    return None if states == 'all' else [state.strip() for state in states.split(',') if state.strip()]
+
+
 def run(*args):
+    """
+    python manage.py runscript refresh_datahub --script-args 200 [shards=4] [states=CO,UT|all] [shard_by=state|network]
+    """
+    options = dict(arg.split('=', 1) for arg in args[1:] if '=' in arg)
+    offset_hrs = int(args[0])
+    state_list = state_list_from(options.get('states', settings.SNOTEL_INGEST_STATES))
+    shards = int(options.get('shards', settings.SNOTEL_INGEST_SHARDS))
+    if shards > 1:
+        ShardedIngest(shards, options.get('shard_by')).run(add_to_db=True, offset_hrs=offset_hrs, state_list=state_list)
+        return
     ds = SnotelDataFetcher()
-    ds.get_all_sites(add_to_db=False)
-    data = asyncio.run(ds.get_all_site_data(add_to_db=True, offset_hrs=int(args[0])))
\ No newline at end of file
+    ds.get_all_sites(add_to_db=False, state_list=state_list)
+    data = asyncio.run(ds.get_all_site_data(add_to_db=True, offset_hrs=offset_hrs))
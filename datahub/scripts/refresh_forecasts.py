@@ -0,0 +1,6 @@
+from datahub.scripts.forecast import NwsForecastFetcher
+import asyncio
+
+def run(*args):
+    fetcher = NwsForecastFetcher()
+    asyncio.run(fetcher.refresh_all(force='force' in args))
@@ -0,0 +1,129 @@
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone
+from datahub.models import UpstreamResponse
+
+
+class CachedResponse:
+    """
+    A cached upstream response.
+
+    Attributes:
+        url (str): The request URL.
+        body (str): The response body, empty if it was cached without one.
+        content_hash (str): SHA-256 of the body.
+        etag (str): The response ETag, if the upstream sent one.
+        last_modified (str): The response Last-Modified header, if the upstream sent one.
+        fetched_at (float): When the response was last fetched or revalidated (epoch seconds).
+    """
+
+    def __init__(self, url, body, content_hash, etag=None, last_modified=None, fetched_at=None):
+        self.url = url
+        self.body = body
+        self.content_hash = content_hash
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at or time.time()
+
+    def is_fresh(self, ttl_seconds):
+        return time.time() - self.fetched_at < ttl_seconds
+
+    def conditional_headers(self):
+        """
+        Returns the headers for a conditional request revalidating this response.
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+def content_hash(body):
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache of upstream responses keyed by URL, stored in the UpstreamResponse table.
+
+    The cache lives in the database rather than on local disk, so every dyno and
+    one-off run shares it. Per-site reports only need their validators
+    (ETag/Last-Modified) and content hash to be skipped when unchanged, so their
+    bodies are only kept when asked for (the station list, which is reused as is).
+
+    The methods query the database, so call them from async code with `sync_to_async`.
+    """
+
+    def get(self, url):
+        """
+        Looks up a cached response.
+
+        Args:
+            url (str): The request URL.
+
+        Returns:
+            CachedResponse: The cached response, or None if there is none.
+        """
+        return self.get_many([url]).get(url)
+
+    def get_many(self, urls):
+        """
+        Looks up the cached responses for several URLs in one query.
+
+        Args:
+            urls (list): The request URLs.
+
+        Returns:
+            dict: CachedResponse by URL, for the URLs that are cached.
+        """
+        return {
+            entry.url: CachedResponse(entry.url, entry.body, entry.content_hash, entry.etag or None,
+                                      entry.last_modified or None, entry.fetched_at.timestamp())
+            for entry in UpstreamResponse.objects.filter(url__in=list(urls))
+        }
+
+    def put(self, response, keep_body=False):
+        """
+        Stores a response, replacing any previous entry for its URL.
+
+        Args:
+            response (CachedResponse): The response to store.
+            keep_body (bool): Also store the body, for responses reused without refetching.
+        """
+        self.put_many([response], keep_body=keep_body)
+
+    def put_many(self, responses, keep_body=False):
+        """
+        Stores several responses in one upsert.
+
+        Args:
+            responses (list): CachedResponse objects to store.
+            keep_body (bool): Also store their bodies.
+        """
+        # Keyed by URL, since one upsert can't touch the same row twice (e.g. a site refetched on retry).
+        entries = {
+            response.url: UpstreamResponse(url=response.url, body=response.body if keep_body else '',
+                                           content_hash=response.content_hash, etag=response.etag or '',
+                                           last_modified=response.last_modified or '',
+                                           fetched_at=datetime.fromtimestamp(response.fetched_at, tz=timezone.utc))
+            for response in responses
+        }
+        update_fields = ['content_hash', 'etag', 'last_modified', 'fetched_at'] + (['body'] if keep_body else [])
+        UpstreamResponse.objects.bulk_create(list(entries.values()), update_conflicts=True, unique_fields=['url'],
+                                             update_fields=update_fields)
+
+    def prune(self, max_age_seconds):
+        """
+        Deletes entries that have not been fetched or revalidated within `max_age_seconds`.
+
+        Per-site URLs include the report window, so entries for past windows are
+        never requested again and would otherwise accumulate.
+
+        Returns:
+            int: The number of entries deleted.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_age_seconds)
+        removed, _ = UpstreamResponse.objects.filter(fetched_at__lt=cutoff).delete()
+        return removed
@@ -1,7 +1,9 @@
 import datetime
+from django.conf import settings
 from datahub.scripts.datahub import SnotelDataFetcher
 from datahub.scripts.db_manager import DatabaseManager
+from datahub.scripts.refresh_datahub import state_list_from
 
-def run():
+def run(*args):
     ds = SnotelDataFetcher()
-    ds.get_all_sites(add_to_db=True, state_list=['CO'])
+    ds.get_all_sites(add_to_db=True, state_list=state_list_from(args[0] if args else settings.SNOTEL_INGEST_STATES))
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import django
+import pandas as pd
+from django.conf import settings
+
+logger = logging.getLogger('testlogger')
+
+
+def assign_shards(sites, n_shards, shard_by='state'):
+    """
+    Splits sites into at most `n_shards` shards of whole states (or networks).
+
+    Groups are placed largest first on the least loaded shard, which keeps shard
+    sizes close without ever splitting a state across workers.
+
+    Args:
+        sites (pd.DataFrame): Sites from `get_all_sites`, with 'state_code' and 'network_code' columns.
+        n_shards (int): Maximum number of shards.
+        shard_by (str): 'state' or 'network'.
+
+    Returns:
+        list: (name, sites) pairs, where the name lists the shard's states or networks.
+    """
+    groups = sorted(sites.groupby(f'{shard_by}_code'), key=lambda group: len(group[1]), reverse=True)
+    shards = [[] for _ in range(min(n_shards, len(groups)))]
+    loads = [0] * len(shards)
+    for key, group in groups:
+        i = loads.index(min(loads))
+        shards[i].append((key, group))
+        loads[i] += len(group)
+    return [(','.join(sorted(str(key) for key, _ in shard)), pd.concat([group for _, group in shard]))
+            for shard in shards]
+
+
+def _init_worker():
+    # Shard workers are spawned fresh, so Django has to be set up before any model import.
+    django.setup()
+
+
+def ingest_shard(name, sites, offset_hrs, add_to_db, base_url=None):
+    """
+    Ingests one shard's sites in a worker process.
+
+    The shard gets its own connection pool, parse threads and batched writer, and
+    leaves the snow grid and IngestRun to the parent.
+
+    Returns:
+        tuple: The shard name, its metrics summary and its wall time in seconds.
+    """
+    from django.db import connections
+    from datahub.scripts.datahub import SnotelDataFetcher
+
+    start = time.perf_counter()
+    # The workers already use every CPU between them, so parse on threads rather than nested processes.
+    fetcher = SnotelDataFetcher(base_url=base_url, parse_executor='thread')
+    fetcher.all_sites = sites
+    try:
+        asyncio.run(fetcher.get_all_site_data(add_to_db=add_to_db, offset_hrs=offset_hrs, save_run=False))
+    finally:
+        connections.close_all()
+    return name, fetcher.metrics.summary(), time.perf_counter() - start
+
+
+class ShardedIngest:
+    """
+    Runs an ingest as shards of whole states (or networks) in parallel worker processes.
+
+    The parent fetches the station list once, assigns shards, and merges each
+    shard's metrics into one IngestRun with per-shard wall times, so refresh wall
+    time stays close to the slowest shard as coverage grows.
+
+    Attributes:
+        n_shards (int): Maximum number of worker processes.
+        shard_by (str): 'state' or 'network'.
+    """
+
+    def __init__(self, n_shards=None, shard_by=None, base_url=None):
+        from datahub.scripts.datahub import SnotelDataFetcher
+
+        self.n_shards = n_shards or settings.SNOTEL_INGEST_SHARDS
+        self.shard_by = shard_by or settings.SNOTEL_SHARD_BY
+        self.fetcher = SnotelDataFetcher(base_url=base_url)
+
+    def run(self, add_to_db, offset_hrs=200, state_list=['CO']):
+        """
+        Ingests every site in `state_list` across the shard workers.
+
+        Args:
+            add_to_db (bool): If True, the retrieved data will be added to the database.
+            offset_hrs (int): The number of hours to go back from the current time.
+            state_list (list): State codes to ingest, or None for every state.
+
+        Returns:
+            IngestMetrics: The merged metrics of the run.
+        """
+        metrics = self.fetcher.metrics
+        self.fetcher.get_all_sites(add_to_db=False, state_list=state_list)
+        if self.fetcher.all_sites is None or self.fetcher.all_sites.empty:
+            return metrics
+
+        shards = assign_shards(self.fetcher.all_sites, self.n_shards, self.shard_by)
+        logger.info("Ingesting %s sites in %s shards: %s", len(self.fetcher.all_sites), len(shards),
+                    '; '.join(f"{name} ({len(sites)})" for name, sites in shards))
+
+        context = multiprocessing.get_context('spawn')
+        start = time.perf_counter()
+        with metrics.stage('shards'), ProcessPoolExecutor(max_workers=len(shards), mp_context=context,
+                                                          initializer=_init_worker) as pool:
+            futures = {
+                pool.submit(ingest_shard, name, sites, offset_hrs, add_to_db, self.fetcher.base_url): (name, sites)
+                for name, sites in shards
+            }
+            for future in as_completed(futures):
+                name, sites = futures[future]
+                try:
+                    _, summary, seconds = future.result()
+                except Exception as e:
+                    logger.error("Ingest shard %s failed: %s", name, str(e))
+                    metrics.incr('sites_requested', len(sites))
+                    metrics.incr('sites_failed', len(sites))
+                    metrics.shard_stats[name] = {'seconds': round(time.perf_counter() - start, 4), 'error': str(e)}
+                    continue
+                metrics.merge(summary, shard=name, seconds=seconds)
+
+        if add_to_db:
+            self.fetcher.finish_run()
+        return metrics
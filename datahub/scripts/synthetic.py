@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+
+
+SITE_DATA_COLUMNS = ['Date', 'Snow Water Equivalent (in)', 'Snow Depth (in)',
+                     'Precipitation Accumulation (in)', 'Air Temperature Observed (degF)']
+
+
+def generate_sites(n_sites, state='CO', network='BENCH', seed=0):
+    """
+    Generates synthetic SNOTEL sites.
+
+    Site IDs follow the same 'SNOTEL:<station>_<state>_<network>' format as real
+    sites, using a dedicated network code so they never collide with real data.
+
+    Args:
+        n_sites (int): Number of sites to generate.
+        state (str): State code for every site.
+        network (str): Network code for every site.
+        seed (int): Random seed.
+
+    Returns:
+        pd.DataFrame: Site rows with 'site_id', 'name', 'lat', 'lon', 'elevation_ft',
+            'state_code' and 'network_code' columns.
+    """
+    rng = np.random.default_rng(seed)
+    station_ids = np.arange(900000, 900000 + n_sites)
+    return pd.DataFrame({
+        'station_id': station_ids,
+        'site_id': [f'SNOTEL:{s}_{state}_{network}' for s in station_ids],
+        'name': [f'Synthetic Site {s}' for s in station_ids],
+        'lat': rng.uniform(37.0, 41.0, n_sites).round(5),
+        'lon': rng.uniform(-109.0, -102.0, n_sites).round(5),
+        'elevation_ft': rng.uniform(7000, 12500, n_sites).round(0),
+        'state_code': state,
+        'network_code': network,
+    })
+
+
+def _series(n_hours, seed):
+    rng = np.random.default_rng(seed)
+    hours = np.arange(n_hours)
+    temp = (20 + 12 * np.sin(2 * np.pi * hours / 24) + rng.normal(0, 2, n_hours)).round(1)
+    snow_depth = np.maximum(0, 40 + np.cumsum(rng.normal(0, 0.5, n_hours))).round(0)
+    return temp, snow_depth
+
+
+def generate_observations(sites, n_hours, end=None, seed=0):
+    """
+    Generates hourly synthetic observations in the format `insert_snotel_data` expects.
+
+    Args:
+        sites (pd.DataFrame): Sites from `generate_sites`.
+        n_hours (int): Number of hourly observations per site.
+        end (pd.Timestamp): Timestamp of the last observation (default: the current hour, UTC).
+        seed (int): Random seed.
+
+    Returns:
+        pd.DataFrame: Rows with 'snotel_site_id', 'temp', 'snow_depth' and 'timestamp' columns.
+    """
+    end = end or pd.Timestamp.now(tz='UTC').floor('h')
+    timestamps = pd.date_range(end=end, periods=n_hours, freq='h')
+    frames = []
+    for i, site_id in enumerate(sites['site_id']):
+        temp, snow_depth = _series(n_hours, seed + i)
+        frames.append(pd.DataFrame({
+            'snotel_site_id': site_id,
+            'temp': temp,
+            'snow_depth': snow_depth,
+            'timestamp': timestamps,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def site_list_csv(sites):
+    """
+    Renders sites as the USDA multiple-station report CSV used by `get_all_sites`.
+
+    Args:
+        sites (pd.DataFrame): Sites from `generate_sites`.
+
+    Returns:
+        str: The CSV text, including the report's '#' comment header.
+    """
+    df = pd.DataFrame({
+        'Station Id': sites['station_id'],
+        'State Code': sites['state_code'],
+        'Network Code': sites['network_code'],
+        'Station Name': sites['name'],
+        'Elevation': sites['elevation_ft'],
+        'Latitude': sites['lat'],
+        'Longitude': sites['lon'],
+    })
+    return '#\n# Synthetic station list\n#\n' + df.to_csv(index=False)
+
+
+def site_data_csv(station_triplet, start_date, end_date):
+    """
+    Renders hourly data as the USDA single-station report CSV used by `_get_data`.
+
+    The series is seeded from the station ID so repeated requests return the same data.
+
+    Args:
+        station_triplet (str): Station triplet such as '900000:CO:BENCH'.
+        start_date (str): First day of the report, 'YYYY-MM-DD'.
+        end_date (str): Last day of the report, 'YYYY-MM-DD'.
+
+    Returns:
+        str: The CSV text, including the report's '#' comment header.
+    """
+    dates = pd.date_range(start=start_date, end=pd.Timestamp(end_date) + pd.Timedelta(hours=23), freq='h')
+    seed = int(station_triplet.split(':')[0]) if station_triplet.split(':')[0].isdigit() else 0
+    temp, snow_depth = _series(len(dates), seed)
+    df = pd.DataFrame({
+        SITE_DATA_COLUMNS[0]: dates.strftime('%Y-%m-%d %H:%M'),
+        SITE_DATA_COLUMNS[1]: (snow_depth / 4).round(1),
+        SITE_DATA_COLUMNS[2]: snow_depth,
+        SITE_DATA_COLUMNS[3]: 20.0,
+        SITE_DATA_COLUMNS[4]: temp,
+    })
+    return f'#\n# Synthetic hourly data for {station_triplet}\n#\n' + df.to_csv(index=False)
+
+
+def forecast_periods(start=None, n_periods=156, seed=0):
+    """
+    Generates NWS-style hourly forecast periods.
+
+    Args:
+        start (pd.Timestamp): Start of the first period (default: the current hour, UTC).
+        n_periods (int): Number of hourly periods; the NWS API returns 156.
+        seed (int): Random seed.
+
+    Returns:
+        list: Period dicts with the fields the site page reads.
+    """
+    rng = np.random.default_rng(seed)
+    start = start or pd.Timestamp.now(tz='UTC').floor('h')
+    directions = ['N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE', 'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW']
+    temp, _ = _series(n_periods, seed)
+    periods = []
+    for i in range(n_periods):
+        period_start = start + pd.Timedelta(hours=i)
+        periods.append({
+            'number': i + 1,
+            'startTime': period_start.isoformat(),
+            'endTime': (period_start + pd.Timedelta(hours=1)).isoformat(),
+            'temperature': int(temp[i]),
+            'temperatureUnit': 'F',
+            'probabilityOfPrecipitation': {'unitCode': 'wmoUnit:percent', 'value': int(rng.integers(0, 100))},
+            'windSpeed': f'{int(rng.integers(0, 35))} mph',
+            'windDirection': directions[int(rng.integers(0, len(directions)))],
+            'shortForecast': 'Snow Showers Likely',
+        })
+    return periods
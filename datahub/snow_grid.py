@@ -0,0 +1,168 @@
+import gzip
+import logging
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.utils import timezone
+from .models import SnotelSite, SnotelData, SnowGrid
+
+
+logger = logging.getLogger('testlogger')
+
+FIELDS = ('snow_depth', 'new_snow')
+KM_PER_DEG = 111.32
+
+# The grid is interpolated in square tiles of this many cells a side, each against only the sites near it.
+TILE_CELLS = 64
+# Upper bound on a pass's cells x sites distance matrix (8 bytes each, a few temporaries alive at once).
+MAX_PASS_ELEMENTS = 1_000_000
+
+
+def site_readings(now=None):
+    """
+    Returns each site's latest snow depth and its gain over the preceding 24 hours.
+
+    Only sites with a reading within SNOW_GRID_MAX_AGE_HOURS are included.
+
+    Returns:
+        pd.DataFrame: Rows with 'lat', 'lon', 'snow_depth' and 'new_snow' columns.
+    """
+    now = now or timezone.now()
+    since = now - timedelta(hours=settings.SNOW_GRID_MAX_AGE_HOURS + 24)
+    rows = (SnotelData.objects.filter(timestamp__gte=since, snow_depth__isnull=False)
+            .values_list('snotel_site_id', 'timestamp', 'snow_depth'))
+    df = pd.DataFrame.from_records(list(rows), columns=['site_id', 'timestamp', 'snow_depth'])
+    if df.empty:
+        return pd.DataFrame(columns=['lat', 'lon', 'snow_depth', 'new_snow'])
+    df = df.sort_values(['site_id', 'timestamp'])
+
+    latest = df.groupby('site_id').last()
+    latest = latest[latest['timestamp'] >= now - timedelta(hours=settings.SNOW_GRID_MAX_AGE_HOURS)]
+    # Depth 24 hours before each site's latest reading, from the last reading at or before then.
+    df['cutoff'] = df['site_id'].map(latest['timestamp'] - timedelta(hours=24))
+    earlier = df[df['timestamp'] <= df['cutoff']].groupby('site_id')['snow_depth'].last()
+    latest['new_snow'] = (latest['snow_depth'] - earlier.reindex(latest.index)).clip(lower=0)
+
+    sites = pd.DataFrame.from_records(
+        list(SnotelSite.objects.filter(site_id__in=latest.index).values('site_id', 'lat', 'lon')),
+        columns=['site_id', 'lat', 'lon'],
+    ).set_index('site_id')
+    return sites.join(latest[['snow_depth', 'new_snow']], how='inner')
+
+
+def interpolate_idw(lats, lons, values, grid_lats, grid_lons, power=2.0, max_distance_km=None):
+    """
+    Inverse-distance-weighted interpolation of site values onto a lat/lon grid.
+
+    Distances are equirectangular kilometres, which is accurate enough at the scale
+    of a state. Cells further than `max_distance_km` from every site are NaN, and
+    sites with a NaN value are ignored.
+
+    The grid is filled tile by tile. With `max_distance_km`, each tile only weighs
+    the sites inside its bounding box grown by that distance, and each pass over a
+    tile is sized to at most MAX_PASS_ELEMENTS cells x sites, so memory stays
+    bounded however many sites report.
+
+    Args:
+        lats (np.ndarray): Site latitudes.
+        lons (np.ndarray): Site longitudes.
+        values (np.ndarray): Site values.
+        grid_lats (np.ndarray): Latitude of each grid row.
+        grid_lons (np.ndarray): Longitude of each grid column.
+        power (float): The IDW power parameter.
+        max_distance_km (float): Cells further than this from every site are left empty.
+
+    Returns:
+        np.ndarray: The (len(grid_lats), len(grid_lons)) float32 grid.
+    """
+    keep = ~np.isnan(values)
+    lats, lons, values = lats[keep], lons[keep], values[keep]
+    grid = np.full((len(grid_lats), len(grid_lons)), np.nan, dtype=np.float32)
+    if len(values) == 0:
+        return grid
+
+    lon_scale = np.cos(np.radians(np.mean(grid_lats))) * KM_PER_DEG
+    for row in range(0, len(grid_lats), TILE_CELLS):
+        tile_lats = grid_lats[row:row + TILE_CELLS]
+        for col in range(0, len(grid_lons), TILE_CELLS):
+            tile_lons = grid_lons[col:col + TILE_CELLS]
+            near = slice(None)
+            if max_distance_km is not None:
+                lat_margin = max_distance_km / KM_PER_DEG
+                lon_margin = max_distance_km / lon_scale
+                near = ((lats >= tile_lats.min() - lat_margin) & (lats <= tile_lats.max() + lat_margin)
+                        & (lons >= tile_lons.min() - lon_margin) & (lons <= tile_lons.max() + lon_margin))
+                if not near.any():
+                    continue
+            tile_sites = (lats[near], lons[near], values[near])
+            rows_per_pass = max(1, MAX_PASS_ELEMENTS // (len(tile_lons) * len(tile_sites[0])))
+            for start in range(0, len(tile_lats), rows_per_pass):
+                rows = tile_lats[start:start + rows_per_pass]
+                grid[row + start:row + start + len(rows), col:col + len(tile_lons)] = _idw_pass(
+                    rows, tile_lons, *tile_sites, lon_scale, power, max_distance_km)
+    return grid
+
+
+def _idw_pass(grid_lats, grid_lons, lats, lons, values, lon_scale, power, max_distance_km):
+    dy = (grid_lats[:, None, None] - lats[None, None, :]) * KM_PER_DEG
+    dx = (grid_lons[None, :, None] - lons[None, None, :]) * lon_scale
+    distance = np.hypot(dx, dy)
+    with np.errstate(divide='ignore'):
+        weights = distance ** -power
+    # A cell on top of a site takes that site's value.
+    exact = np.isinf(weights)
+    weights = np.where(exact.any(axis=-1, keepdims=True), exact.astype(float), weights)
+    if max_distance_km is not None:
+        weights = np.where(distance <= max_distance_km, weights, 0.0)
+    total = weights.sum(axis=-1)
+    with np.errstate(invalid='ignore'):
+        return (weights @ values) / total
+
+
+def compute_snow_grid():
+    """
+    Interpolates the latest site readings onto a grid and saves it as a SnowGrid.
+
+    The grid covers the reporting sites' bounding box plus a margin, at
+    SNOW_GRID_CELL_DEG resolution. Older grids beyond the latest few are deleted.
+
+    Returns:
+        SnowGrid: The saved grid, or None if no site has a recent reading.
+    """
+    readings = site_readings()
+    if readings.empty:
+        logger.info("No recent snow depth readings, skipping the snow grid")
+        return None
+
+    cell = settings.SNOW_GRID_CELL_DEG
+    margin = settings.SNOW_GRID_MAX_DISTANCE_KM / KM_PER_DEG
+    west = round(np.floor((readings['lon'].min() - margin) / cell) * cell, 6)
+    east = round(np.ceil((readings['lon'].max() + margin) / cell) * cell, 6)
+    south = round(np.floor((readings['lat'].min() - margin) / cell) * cell, 6)
+    north = round(np.ceil((readings['lat'].max() + margin) / cell) * cell, 6)
+    width = int(round((east - west) / cell))
+    height = int(round((north - south) / cell))
+    # Cell centres, north row first as in an image.
+    grid_lats = north - (np.arange(height) + 0.5) * cell
+    grid_lons = west + (np.arange(width) + 0.5) * cell
+
+    arrays = {}
+    for field in FIELDS:
+        grid = interpolate_idw(readings['lat'].to_numpy(), readings['lon'].to_numpy(),
+                               readings[field].to_numpy(dtype=float), grid_lats, grid_lons,
+                               power=settings.SNOW_GRID_IDW_POWER,
+                               max_distance_km=settings.SNOW_GRID_MAX_DISTANCE_KM)
+        arrays[field] = gzip.compress(grid.astype('<f4').tobytes(), compresslevel=9)
+
+    snow_grid = SnowGrid.objects.create(
+        computed_at=timezone.now(),
+        west=west, south=south, east=east, north=north,
+        cell_deg=cell, width=width, height=height,
+        site_count=len(readings),
+        **arrays,
+    )
+    stale = SnowGrid.objects.order_by('-computed_at').values_list('pk', flat=True)[settings.SNOW_GRID_KEEP:]
+    SnowGrid.objects.filter(pk__in=list(stale)).delete()
+    logger.info("Computed a %sx%s snow grid from %s sites", width, height, len(readings))
+    return snow_grid
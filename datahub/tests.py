@@ -1,3 +1,485 @@
-from django.test import TestCase
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+import numpy as np
+import pandas as pd
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from .alerts import AlertEvaluator, SnowWindow
+from .assets import parse_accept_encoding
+from .cold_storage import ColdStorage, season_bounds
+from .events import MAX_PAYLOAD_BYTES, notify_payloads
+from .hot_cache import HotWindowCache, SiteSeries
+from .models import AlertOutbox, AlertRule, ArchivedSeason, ForecastGridpoint, IngestRun, SiteAlertState, SnotelData, SnotelSite
+from .pagination import InvalidPage, decode_cursor, encode_cursor
+from .scripts.datahub import SnotelDataFetcher, parse_site_csv
+from .scripts.fake_upstream import FakeUpstream
+from .scripts.metrics import IngestMetrics, render_prometheus
+from .scripts.sharded_ingest import assign_shards
+from .snow_grid import interpolate_idw
 
-# Create your tests here.
+
+class IngestMetricsTests(TestCase):
+
+    def test_stages_accumulate(self):
+        metrics = IngestMetrics()
+        for _ in range(2):
+            with metrics.stage('parse'):
+                pass
+        metrics.add_time('parse', 1.5)
+        self.assertGreaterEqual(metrics.stage_seconds['parse'], 1.5)
+
+    def test_render_without_runs(self):
+        self.assertEqual(render_prometheus(None), '# HELP funtel_ingest_runs_total Number of recorded ingest runs.\n'
+                                                  '# TYPE funtel_ingest_runs_total counter\n'
+                                                  'funtel_ingest_runs_total 0\n')
+
+    def test_render_last_run(self):
+        metrics = IngestMetrics()
+        metrics.record_fetch('SNOTEL:1_CO_SNTL', 0.25, 1024, rows=24)
+        metrics.record_fetch('SNOTEL:"2"_CO_SNTL', 1.0, 0, ok=False)
+        metrics.incr('rows_inserted', 20)
+        metrics.add_time('fetch', 2.0)
+        run = metrics.save()
+        text = render_prometheus(run)
+        self.assertIn('funtel_ingest_runs_total 1\n', text)
+        self.assertIn('funtel_ingest_last_run_stage_seconds{stage="fetch"} 2.0\n', text)
+        self.assertIn('funtel_ingest_last_run_sites_fetched 1\n', text)
+        self.assertIn('funtel_ingest_last_run_sites_failed 1\n', text)
+        self.assertIn('funtel_ingest_last_run_rows_inserted 20\n', text)
+        self.assertIn('funtel_ingest_last_run_site_fetch_bytes{site_id="SNOTEL:1_CO_SNTL"} 1024\n', text)
+        self.assertIn('funtel_ingest_last_run_site_fetch_seconds{site_id="SNOTEL:\\"2\\"_CO_SNTL"} 1.0\n', text)
+        self.assertEqual(IngestRun.objects.get().rows_parsed, 24)
+
+
+class ParseAcceptEncodingTests(SimpleTestCase):
+
+    def test_qualities(self):
+        self.assertEqual(parse_accept_encoding('gzip, BR;q=0.5, deflate;q=oops, , identity'),
+                         {'gzip': 1.0, 'br': 0.5, 'deflate': 0.0, 'identity': 1.0})
+
+    def test_empty(self):
+        self.assertEqual(parse_accept_encoding(''), {})
+
+
+class ForecastViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        SnotelSite.objects.create(site_id='SNOTEL:0_CO_SNTL', name='Site 0', lat=39.5, lon=-106.0, elevation_ft=10000)
+
+    def test_fetches_then_serves_from_cache(self):
+        with FakeUpstream(n_sites=1) as upstream, override_settings(NWS_API_BASE_URL=upstream.base_url):
+            response = self.client.get('/api/station/SNOTEL:0_CO_SNTL/forecast/')
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            self.assertEqual(body['grid']['id'], 'BOU')
+            self.assertEqual(len(body['periods']), 156)
+            self.assertIn('max-age=', response['Cache-Control'])
+            # Points lookup and hourly forecast; the repeat request is served from the stored gridpoint.
+            self.assertEqual(upstream.requests_served, 2)
+            self.assertEqual(self.client.get('/api/station/SNOTEL:0_CO_SNTL/forecast/').status_code, 200)
+            self.assertEqual(upstream.requests_served, 2)
+        self.assertEqual(ForecastGridpoint.objects.get().periods, body['periods'])
+
+    def test_unknown_station(self):
+        self.assertEqual(self.client.get('/api/station/SNOTEL:9_CO_SNTL/forecast/').status_code, 404)
+
+
+class UnchangedReportTests(TestCase):
+
+    def _ingest(self, upstream):
+        fetcher = SnotelDataFetcher(base_url=upstream.base_url, parse_executor='thread', parse_workers=1)
+        fetcher.all_sites = upstream.sites
+        df = async_to_sync(fetcher.get_all_site_data)(False)
+        fetcher._commit_responses()
+        return fetcher, df
+
+    def test_unchanged_reports_are_skipped(self):
+        with FakeUpstream(n_sites=3) as upstream:
+            fetcher, df = self._ingest(upstream)
+            self.assertEqual(df['snotel_site_id'].nunique(), 3)
+            self.assertEqual(fetcher.metrics.counters['sites_unchanged'], 0)
+
+            fetcher, df = self._ingest(upstream)
+            self.assertIsNone(df)
+            self.assertEqual(fetcher.metrics.counters['sites_unchanged'], 3)
+            self.assertEqual(fetcher.metrics.counters['rows_parsed'], 0)
+
+
+class ParseSiteCsvTests(SimpleTestCase):
+
+    REPORT = ('#\n# Hourly report\n#\n'
+              'Date,Snow Depth (in),Air Temperature Observed (degF)\n'
+              '2023-01-01 00:00,40,12.5\n'
+              '2023-01-01 01:00,,13.0\n'
+              'not a date,41,14.0\n')
+
+    def test_parses_report(self):
+        df, _ = parse_site_csv(self.REPORT, 'SNOTEL:1_CO_SNTL')
+        self.assertEqual(list(df.columns), ['snotel_site_id', 'temp', 'snow_depth', 'timestamp'])
+        self.assertEqual(df['temp'].tolist(), [12.5, 13.0])
+        self.assertEqual(df['snow_depth'].iloc[0], 40)
+        self.assertTrue(np.isnan(df['snow_depth'].iloc[1]))
+        self.assertEqual(str(df['timestamp'].iloc[0]), '2023-01-01 00:00:00-07:00')
+
+    def test_missing_sensor_column_is_null(self):
+        df, _ = parse_site_csv('Date,Snow Depth (in)\n2023-01-01 00:00,40\n', 'SNOTEL:1_CO_SNTL')
+        self.assertTrue(df['temp'].isna().all())
+        self.assertEqual(df['snow_depth'].tolist(), [40])
+
+    def test_empty_body(self):
+        with self.assertRaises(ValueError):
+            parse_site_csv('', 'SNOTEL:1_CO_SNTL')
+
+    def test_html_error_page(self):
+        with self.assertRaises(ValueError):
+            parse_site_csv('<html><body>Service Unavailable</body></html>', 'SNOTEL:1_CO_SNTL')
+
+
+class SiteSeriesTests(SimpleTestCase):
+
+    def setUp(self):
+        epoch = np.arange(0, 5 * 3600, 3600, dtype=np.int64) + 1700000000
+        self.series = SiteSeries(epoch, np.array([1.0, np.nan, 3.0, 4.0, 5.0]),
+                                 np.array([10.0, 11.0, np.nan, 13.0, 14.0]))
+        self.epoch = epoch
+
+    def test_between_is_inclusive(self):
+        rows = self.series.between(self.epoch[1], self.epoch[3])
+        self.assertEqual([row['temp'] for row in rows], [None, 3.0, 4.0])
+        self.assertEqual([row['snow_depth'] for row in rows], [11.0, None, 13.0])
+        self.assertEqual(rows[0]['timestamp_station_local'], '2023-11-14T23:13:20Z')
+
+    def test_between_after_and_limit(self):
+        rows = self.series.between(self.epoch[0], self.epoch[4], after=self.epoch[1], limit=2)
+        self.assertEqual([row['temp'] for row in rows], [3.0, 4.0])
+
+    def test_between_outside_range(self):
+        self.assertEqual(self.series.between(0, 1000), [])
+
+
+class HotWindowViewTests(TestCase):
+
+    def test_station_served_from_cache(self):
+        site = SnotelSite.objects.create(site_id='SNOTEL:0_CO_SNTL', name='Site 0', lat=39.5, lon=-106.0,
+                                         elevation_ft=10000)
+        now = timezone.now().replace(microsecond=0)
+        SnotelData.objects.bulk_create([SnotelData(snotel_site=site, temp=float(i), snow_depth=40.0,
+                                                   timestamp=now - timedelta(hours=i)) for i in range(3)])
+        cache = HotWindowCache(window_days=2, check_seconds=3600)
+        with mock.patch('datahub.views.hot_window_cache', cache):
+            first = self.client.get('/api/station/SNOTEL:0_CO_SNTL/').json()
+            # Rows are read from memory until the next reload, so deleting them changes nothing.
+            SnotelData.objects.all().delete()
+            second = self.client.get('/api/station/SNOTEL:0_CO_SNTL/').json()
+        self.assertEqual([row['temp'] for row in first['data']], [2.0, 1.0, 0.0])
+        self.assertEqual(second, first)
+
+    def test_range_before_window_is_not_cached(self):
+        cache = HotWindowCache(window_days=1, check_seconds=3600)
+        cache.ensure_fresh()
+        now = timezone.now()
+        self.assertIsNone(cache.get('SNOTEL:0_CO_SNTL', now - timedelta(days=2), now))
+
+
+class ColdStorageTests(TestCase):
+
+    def setUp(self):
+        self.site = SnotelSite.objects.create(site_id='SNOTEL:0_CO_SNTL', name='Site 0', lat=39.5, lon=-106.0,
+                                              elevation_ft=10000)
+        self.start = datetime(2021, 1, 1, tzinfo=dt_timezone.utc)
+        self._rows(0, 48)
+        self.storage = ColdStorage()
+
+    def _rows(self, first, last):
+        SnotelData.objects.bulk_create([
+            SnotelData(snotel_site=self.site, temp=float(i), snow_depth=None if i % 5 else 40.0,
+                       timestamp=self.start + timedelta(hours=i))
+            for i in range(first, last)
+        ])
+
+    def _read(self, **kwargs):
+        seasons = list(ArchivedSeason.objects.filter(snotel_site=self.site))
+        return self.storage.read(seasons, *season_bounds(2021), **kwargs)
+
+    def test_round_trip_without_purge(self):
+        self.assertEqual(self.storage.archive(self.site.site_id, 2021, purge=False), 48)
+        archived = ArchivedSeason.objects.get()
+        self.assertEqual((archived.row_count, archived.purged), (48, False))
+        self.assertEqual(SnotelData.objects.count(), 48)
+
+        rows = self._read()
+        self.assertEqual([row['temp'] for row in rows], [float(i) for i in range(48)])
+        self.assertEqual(rows[5]['snow_depth'], 40.0)
+        self.assertIsNone(rows[6]['snow_depth'])
+        self.assertEqual(rows[0]['timestamp_station_local'], '2021-01-01T00:00:00Z')
+        after = self.start.timestamp() + 9 * 3600
+        self.assertEqual([row['temp'] for row in self._read(after=after, limit=2)], [10.0, 11.0])
+
+    def test_unchanged_season_is_not_rewritten(self):
+        self.storage.archive(self.site.site_id, 2021, purge=False)
+        self.assertEqual(self.storage.archive(self.site.site_id, 2021, purge=False), 0)
+        self._rows(48, 50)
+        self.assertEqual(self.storage.archive(self.site.site_id, 2021, purge=False), 50)
+        self.assertEqual(ArchivedSeason.objects.get().row_count, 50)
+
+    def test_purge_deletes_verified_rows(self):
+        self.assertEqual(self.storage.archive(self.site.site_id, 2021, purge=True), 48)
+        self.assertTrue(ArchivedSeason.objects.get().purged)
+        self.assertFalse(SnotelData.objects.exists())
+        self.assertEqual(len(self._read()), 48)
+
+        # A late backfill is merged into the purged season and purged as well.
+        self._rows(48, 50)
+        self.assertEqual(self.storage.archive(self.site.site_id, 2021, purge=False), 2)
+        self.assertFalse(SnotelData.objects.exists())
+        self.assertEqual(len(self._read()), 50)
+
+    def test_purge_keeps_rows_if_archive_is_short(self):
+        metadata = mock.Mock(num_rows=47)
+        with mock.patch('datahub.cold_storage.pq.read_metadata', return_value=metadata):
+            self.storage.archive(self.site.site_id, 2021, purge=True)
+        self.assertFalse(ArchivedSeason.objects.get().purged)
+        self.assertEqual(SnotelData.objects.count(), 48)
+
+
+class CursorTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        cursor = encode_cursor({'after': 'SNOTEL:1000_CO_SNTL', 'end': 1700000000.5})
+        self.assertNotIn('=', cursor)
+        self.assertEqual(decode_cursor(cursor, ('after', 'end')),
+                         {'after': 'SNOTEL:1000_CO_SNTL', 'end': 1700000000.5})
+
+    def test_invalid_cursor(self):
+        for cursor in ('not a cursor!', encode_cursor(['after']), encode_cursor({'end': 1})):
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidPage):
+                decode_cursor(cursor, ('after',))
+
+
+class PaginationViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            SnotelSite.objects.create(site_id=f'SNOTEL:{i}_CO_SNTL', name=f'Site {i}', lat=39.0, lon=-106.0,
+                                      elevation_ft=10000)
+
+    def test_stations_follow_next_link(self):
+        site_ids = []
+        url = '/api/stations/?limit=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            site_ids += [station['site_id'] for station in response.json()]
+            url = response.headers.get('Link', '').partition('<')[2].partition('>')[0]
+        self.assertEqual(site_ids, [f'SNOTEL:{i}_CO_SNTL' for i in range(3)])
+
+    def test_invalid_cursor_is_a_bad_request(self):
+        for url in ('/api/stations/', '/api/station/SNOTEL:0_CO_SNTL/'):
+            with self.subTest(url=url):
+                response = self.client.get(url, {'cursor': 'garbage'})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'Invalid cursor'})
+
+    def test_invalid_limit_is_a_bad_request(self):
+        self.assertEqual(self.client.get('/api/stations/', {'limit': '0'}).status_code, 400)
+
+    def test_out_of_range_cursor_is_a_bad_request(self):
+        for position in ({'after': float('nan'), 'end': 0}, {'after': 0, 'end': 1e300}, {'after': -1e18, 'end': 0}):
+            with self.subTest(position=position):
+                response = self.client.get('/api/station/SNOTEL:0_CO_SNTL/', {'cursor': encode_cursor(position)})
+                self.assertEqual(response.status_code, 400)
+
+    def test_time_offset(self):
+        url = '/api/station/SNOTEL:0_CO_SNTL/'
+        # Offsets reaching back past any record are capped rather than overflowing.
+        self.assertEqual(self.client.get(url, {'time_offset_hrs': '100000000'}).status_code, 200)
+        self.assertEqual(self.client.get(url, {'time_offset_hrs': '1' + '0' * 30}).status_code, 200)
+        for value in ('-1', 'abc', '1e5'):
+            with self.subTest(value=value):
+                response = self.client.get(url, {'time_offset_hrs': value})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'Invalid time_offset_hrs'})
+
+
+class HotCacheInvalidateTests(TestCase):
+
+    def test_invalidate_reloads_before_the_run_is_saved(self):
+        site = SnotelSite.objects.create(site_id='SNOTEL:0_CO_SNTL', name='Site 0', lat=39.5, lon=-106.0,
+                                         elevation_ft=10000)
+        cache = HotWindowCache(window_days=1, check_seconds=3600)
+        cache.ensure_fresh()
+        now = timezone.now()
+        SnotelData.objects.create(snotel_site=site, temp=1.0, snow_depth=40.0, timestamp=now - timedelta(hours=1))
+
+        # The rows are published while the ingest's IngestRun is still unsaved, so the latest run ID is unchanged.
+        cache.invalidate()
+        cache.ensure_fresh()
+        self.assertEqual(len(cache.get(site.site_id, now - timedelta(hours=2), now)), 1)
+
+
+class NotifyPayloadsTests(SimpleTestCase):
+
+    def test_splits_under_the_size_limit(self):
+        site_ids = [f'SNOTEL:{i:06d}_CO_SNTL' for i in range(1000)]
+        payloads = notify_payloads(site_ids)
+        self.assertGreater(len(payloads), 1)
+        self.assertTrue(all(len(payload.encode()) < MAX_PAYLOAD_BYTES + 100 for payload in payloads))
+        self.assertEqual([site for payload in payloads for site in json.loads(payload)['sites']], site_ids)
+
+    def test_no_sites(self):
+        self.assertEqual(notify_payloads([]), [])
+
+
+class InterpolateIdwTests(SimpleTestCase):
+
+    def test_exact_hit_takes_site_value(self):
+        grid = interpolate_idw(np.array([39.0, 39.5]), np.array([-106.0, -105.5]), np.array([10.0, 50.0]),
+                               np.array([39.0, 39.25]), np.array([-106.0, -105.75]))
+        self.assertEqual(grid[0, 0], 10.0)
+        self.assertTrue(10.0 < grid[1, 1] < 50.0)
+
+    def test_max_distance_leaves_far_cells_empty(self):
+        grid = interpolate_idw(np.array([39.0]), np.array([-106.0]), np.array([20.0]),
+                               np.array([39.0, 39.1, 41.0]), np.array([-106.0]), max_distance_km=20.0)
+        self.assertEqual(grid[0, 0], 20.0)
+        self.assertEqual(grid[1, 0], 20.0)
+        self.assertTrue(np.isnan(grid[2, 0]))
+
+    def test_nan_sites_are_ignored(self):
+        grid = interpolate_idw(np.array([39.0, 39.0]), np.array([-106.0, -105.9]), np.array([np.nan, 30.0]),
+                               np.array([39.0]), np.array([-106.0]))
+        self.assertEqual(grid[0, 0], 30.0)
+
+
+class ShardStatsTests(TestCase):
+
+    def test_failed_shards_render(self):
+        metrics = IngestMetrics()
+        metrics.merge({'stage_seconds': {'fetch': 1.0}, 'counters': {'sites_fetched': 3}, 'site_stats': {}},
+                      shard='CO', seconds=2.5)
+        metrics.shard_stats['UT'] = {'seconds': 0.5, 'error': 'worker died'}
+        # Runs saved before failed shards recorded their wall time.
+        metrics.shard_stats['WY'] = {'error': 'worker died'}
+        text = render_prometheus(metrics.save())
+        self.assertIn('funtel_ingest_last_run_shard_seconds{shard="CO"} 2.5\n', text)
+        self.assertIn('funtel_ingest_last_run_shard_seconds{shard="UT"} 0.5\n', text)
+        self.assertIn('funtel_ingest_last_run_shard_seconds{shard="WY"} 0\n', text)
+        self.assertIn('funtel_ingest_last_run_shard_failed{shard="CO"} 0\n', text)
+        self.assertIn('funtel_ingest_last_run_shard_failed{shard="UT"} 1\n', text)
+
+
+class AssignShardsTests(SimpleTestCase):
+
+    def test_keeps_states_whole_and_balances(self):
+        sites = pd.DataFrame({
+            'site_id': [f'S{i}' for i in range(10)],
+            'state_code': ['CO'] * 5 + ['UT'] * 3 + ['WY'] * 2,
+            'network_code': ['SNTL'] * 10,
+        })
+        shards = dict(assign_shards(sites, 2))
+        self.assertEqual(sorted(shards), ['CO', 'UT,WY'])
+        self.assertEqual(len(shards['CO']), 5)
+        self.assertEqual(set(shards['UT,WY']['state_code']), {'UT', 'WY'})
+
+    def test_no_more_shards_than_groups(self):
+        sites = pd.DataFrame({'site_id': ['S0', 'S1'], 'state_code': ['CO', 'CO'], 'network_code': ['SNTL', 'SCAN']})
+        self.assertEqual(len(assign_shards(sites, 4)), 1)
+        self.assertEqual([name for name, _ in assign_shards(sites, 4, shard_by='network')], ['SCAN', 'SNTL'])
+
+
+class StationSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for site_id, name in (('SNOTEL:1_CO_SNTL', 'Berthoud Summit'), ('SNOTEL:2_CO_SNTL', 'Lake Irene'),
+                              ('SNOTEL:3_CO_SNTL', 'Irene Summit'), ('SNOTEL:12_CO_SNTL', 'Copper Mountain')):
+            SnotelSite.objects.create(site_id=site_id, name=name, lat=39.5, lon=-106.0, elevation_ft=10000)
+
+    def _search(self, q, **params):
+        return self.client.get('/api/stations/search/', {'q': q, **params})
+
+    def test_name_prefix_ranks_first(self):
+        names = [station['name'] for station in self._search('irene').json()]
+        self.assertEqual(names, ['Irene Summit', 'Lake Irene'])
+
+    def test_exact_site_id_ranks_first(self):
+        site_ids = [station['site_id'] for station in self._search('snotel:1_co_sntl').json()]
+        self.assertEqual(site_ids, ['SNOTEL:1_CO_SNTL'])
+        site_ids = [station['site_id'] for station in self._search('SNOTEL:1', limit=2).json()]
+        self.assertEqual(site_ids, ['SNOTEL:1_CO_SNTL', 'SNOTEL:12_CO_SNTL'])
+
+    def test_short_query_is_a_bad_request(self):
+        self.assertEqual(self._search('ir').status_code, 400)
+        self.assertEqual(self._search('   ').status_code, 400)
+
+
+class SnowWindowTests(SimpleTestCase):
+
+    def test_needs_a_day_of_history(self):
+        window = SnowWindow()
+        window.push(0, 10.0)
+        window.push(12 * 3600, 14.0)
+        self.assertIsNone(window.new_snow())
+
+    def test_gain_from_the_24h_baseline(self):
+        window = SnowWindow()
+        for hour, depth in [(0, 10.0), (6, 12.0), (24, 15.0), (30, 20.0)]:
+            window.push(hour * 3600, depth)
+        # The baseline is the last reading at or before 24h ago (hour 6).
+        self.assertEqual(window.readings[0], (6 * 3600, 12.0))
+        self.assertEqual(window.new_snow(), 8.0)
+
+    def test_no_negative_gain(self):
+        window = SnowWindow([(0, 20.0)])
+        window.push(24 * 3600, 15.0)
+        self.assertEqual(window.new_snow(), 0.0)
+
+
+@override_settings(ALERT_MAX_AGE_HOURS=48)
+class AlertEvaluatorTests(TestCase):
+
+    def setUp(self):
+        self.site = SnotelSite.objects.create(site_id='SNOTEL:1_CO_SNTL', name='Site 1', lat=39.0, lon=-106.0,
+                                              elevation_ft=10000)
+        self.rule = AlertRule.objects.create(name='Thaw', metric=AlertRule.TEMP, threshold=32,
+                                             webhook_url='https://example.com/hook')
+        self.now = timezone.now().replace(minute=0, second=0, microsecond=0)
+
+    def _rows(self, temps, start_hours_ago):
+        rows = []
+        for i, temp in enumerate(temps):
+            timestamp = self.now - timedelta(hours=start_hours_ago - i)
+            SnotelData.objects.create(snotel_site=self.site, timestamp=timestamp, temp=temp, snow_depth=10.0)
+            rows.append((self.site.site_id, timestamp, temp, 10.0))
+        return rows
+
+    def test_fires_once_and_rearms(self):
+        evaluator = AlertEvaluator()
+        self.assertEqual(evaluator.evaluate(self._rows([20, 35, 40], 10)), 1)
+        self.assertEqual(evaluator.evaluate(self._rows([36], 7)), 0)
+        self.assertEqual(evaluator.evaluate(self._rows([30, 33], 6)), 1)
+        self.assertEqual(list(AlertOutbox.objects.order_by('observed_at').values_list('value', flat=True)),
+                         [35.0, 33.0])
+        self.assertEqual(SiteAlertState.objects.get(pk=self.site.pk).active_rules, [self.rule.pk])
+
+    def test_old_rows_update_state_without_firing(self):
+        evaluator = AlertEvaluator()
+        self.assertEqual(evaluator.evaluate(self._rows([20, 35], 500)), 0)
+        self.assertEqual(SiteAlertState.objects.get(pk=self.site.pk).active_rules, [self.rule.pk])
+
+    def test_late_rows_are_skipped(self):
+        evaluator = AlertEvaluator()
+        evaluator.evaluate(self._rows([20], 2))
+        self.assertEqual(evaluator.evaluate(self._rows([40], 5)), 0)
+        self.assertEqual(AlertOutbox.objects.count(), 0)
+
+    def test_replays_rows_missed_by_a_failed_batch(self):
+        evaluator = AlertEvaluator()
+        evaluator.evaluate(self._rows([20], 6))
+        self._rows([20, 35, 20], 5)  # inserted, but never evaluated
+        self.assertEqual(evaluator.evaluate(self._rows([20], 2)), 1)
+        self.assertEqual(AlertOutbox.objects.get().observed_at, self.now - timedelta(hours=4))
@@ -1,14 +1,27 @@
 
 from django.http import JsonResponse
-from django.core.exceptions import ObjectDoesNotExist
-from .models import SnotelSite, SnotelData
-from datetime import datetime, timedelta
-from rest_framework import viewsets
-from .serializers import SnotelSiteSerializer, SnotelDataSerializer
+from django.db.models import Case, IntegerField, OuterRef, Q, Subquery, Value, When
+from .assets import asset_index, parse_accept_encoding
+from .cold_storage import cold_storage
+from .events import event_stream
+from .pagination import InvalidPage, decode_cursor, encode_cursor, next_link, page_limit
+from .hot_cache import hot_window_cache
+from .snow_grid import FIELDS as SNOW_GRID_FIELDS
+from .models import SnotelSite, SnotelData, IngestRun, ArchivedSeason, SnowGrid
+from .scripts.forecast import NwsForecastFetcher
+from .scripts.metrics import render_prometheus
+from .middleware import latency_histograms, profile_stage
+from .warmup import worker_startup
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+import aiohttp
+from asgiref.sync import sync_to_async
+import asyncio
 from django.views import View
-from django.http import HttpResponse, HttpResponseNotFound
-import os
-import pytz
+from django.http import FileResponse, HttpResponse, HttpResponseNotFound, HttpResponseNotModified, StreamingHttpResponse
+import gzip
 
 import logging
 logger = logging.getLogger('testlogger')
@@ -16,60 +29,273 @@ logger = logging.getLogger('testlogger')
 
 class Assets(View):
 
-    def get(self, _request, filename):
-        path = os.path.join(os.path.dirname(__file__), 'static', filename)
+    def get(self, request, filename):
+        asset = asset_index.get(filename)
+        if asset is None:
+            return HttpResponseNotFound()
 
-        if os.path.isfile(path):
-            with open(path, 'rb') as file:
-                return HttpResponse(file.read(), content_type='application/javascript')
+        encoding, path, size, etag = asset.negotiate(request.headers.get('Accept-Encoding', ''))
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
         else:
-            return HttpResponseNotFound()
+            response = FileResponse(open(path, 'rb'), content_type=asset.content_type)
+            response['Content-Length'] = size
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Vary'] = 'Accept-Encoding'
+        # Hashed names change whenever the content does, so they never need revalidating.
+        response['Cache-Control'] = 'public, max-age=31536000, immutable' if asset.immutable else 'no-cache'
+        return response
+
+
+class Metrics(View):
+
+    def get(self, _request):
+        try:
+            run = IngestRun.objects.latest()
+        except IngestRun.DoesNotExist:
+            run = None
+        body = render_prometheus(run) + latency_histograms.render_prometheus() + worker_startup.render_prometheus()
+        return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class AllStationsView(View):
+
+    async def get(self, request):
+        try:
+            limit = page_limit(request, settings.STATIONS_PAGE_LIMIT, settings.STATIONS_PAGE_LIMIT_MAX)
+            cursor = request.GET.get('cursor')
+            after = decode_cursor(cursor, ('after',))['after'] if cursor else None
+        except InvalidPage as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        latest = SnotelData.objects.filter(snotel_site=OuterRef('pk')).order_by('-timestamp')
+        stations = SnotelSite.objects.order_by('site_id')
+        if after is not None:
+            stations = stations.filter(site_id__gt=after)
+        stations = stations.annotate(
+            latest_snow_depth=Subquery(latest.values('snow_depth')[:1]),
+            latest_timestamp=Subquery(latest.values('timestamp')[:1]),
+        ).values('site_id', 'name', 'lat', 'lon', 'elevation_ft', 'latest_snow_depth', 'latest_timestamp')
+        # One extra row tells us whether there is a next page.
+        data = [station async for station in stations[:limit + 1]]
+
+        with profile_stage('serialize'):
+            response = JsonResponse(data[:limit], safe=False)
+        if len(data) > limit:
+            cursor = encode_cursor({'after': data[limit - 1]['site_id']})
+            response['Link'] = f'<{next_link(request, cursor)}>; rel="next"'
+        return response
+
+
+# pg_trgm extracts no trigrams from a LIKE pattern shorter than 3 characters, so shorter
+# queries would scan the whole index.
+SEARCH_MIN_CHARS = 3
 
 
-class AllStationsView(viewsets.ViewSet):
-    def list(self, request):
-        stations = SnotelSite.objects.all()
-        data = []
-        for station in stations:
-            station_data = {
-                'site_id': station.site_id,
-                'name': station.name,
-                'lat': station.lat,
-                'lon': station.lon,
-                'elevation_ft': station.elevation_ft
-            }
+class StationSearchView(View):
+
+    async def get(self, request):
+        query = request.GET.get('q', '').strip()
+        try:
+            limit = page_limit(request, settings.STATION_SEARCH_LIMIT, settings.STATION_SEARCH_LIMIT_MAX)
+        except InvalidPage as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        if len(query) < SEARCH_MIN_CHARS:
+            return JsonResponse({'error': f'q must be at least {SEARCH_MIN_CHARS} characters'}, status=400)
+
+        # An exact site ID comes first, then names starting with the query, then other matches.
+        stations = SnotelSite.objects.filter(Q(name__icontains=query) | Q(site_id__icontains=query)).annotate(
+            rank=Case(When(site_id__iexact=query, then=Value(0)),
+                      When(name__istartswith=query, then=Value(1)),
+                      default=Value(2), output_field=IntegerField()),
+        ).order_by('rank', 'name').values('site_id', 'name', 'lat', 'lon', 'elevation_ft')
+        data = [station async for station in stations[:limit]]
+
+        with profile_stage('serialize'):
+            response = JsonResponse(data, safe=False)
+        response['Cache-Control'] = 'public, max-age=300'
+        return response
+
+
+# Longer than any site's record, and small enough that the start of the window never overflows a datetime.
+MAX_TIME_OFFSET_HRS = 24 * 366 * 100
+
+
+def _epoch(timestamp):
+    # Rows from the database carry datetimes; rows from the hot cache and cold storage carry ISO strings.
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return timestamp.timestamp()
+
+
+class StationView(View):
+
+    def _window(self, request):
+        """
+        Works out the requested range, pinned by the cursor on pages after the first.
+
+        Returns:
+            tuple: (start, end, after), where `after` is the epoch time the page continues after, or None.
+        """
+        cursor = request.GET.get('cursor')
+        if cursor:
+            position = decode_cursor(cursor, ('after', 'end'))
             try:
-                latest_data = SnotelData.objects.filter(snotel_site=station).latest('timestamp')
-                station_data['latest_snow_depth'] = latest_data.snow_depth
-                station_data['latest_timestamp'] = latest_data.timestamp
-            except ObjectDoesNotExist:
-                station_data['latest_snow_depth'] = None
-                station_data['latest_timestamp'] = None
-            data.append(station_data)
+                after, end = float(position['after']), float(position['end'])
+                # NaN, infinite and out-of-range times raise here rather than in the view.
+                return (datetime.fromtimestamp(after, tz=dt_timezone.utc),
+                        datetime.fromtimestamp(end, tz=dt_timezone.utc), after)
+            except (TypeError, ValueError, OverflowError, OSError):
+                raise InvalidPage('Invalid cursor')
 
-        return JsonResponse(data, safe=False)
+        try:
+            time_offset_hrs = int(request.GET.get('time_offset_hrs', 24))
+            if time_offset_hrs < 0:
+                raise ValueError(time_offset_hrs)
+            end_time = timezone.now()
+            return end_time - timedelta(hours=min(time_offset_hrs, MAX_TIME_OFFSET_HRS)), end_time, None
+        except (ValueError, OverflowError):
+            raise InvalidPage('Invalid time_offset_hrs')
 
+    def _page(self, request, station_id, rows, end_time, limit):
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor({'after': _epoch(rows[-1]['timestamp_station_local']),
+                                         'end': end_time.timestamp()})
+        with profile_stage('serialize'):
+            response = JsonResponse({'station_id': station_id, 'data': rows, 'next_cursor': next_cursor})
+        if next_cursor:
+            response['Link'] = f'<{next_link(request, next_cursor)}>; rel="next"'
+        return response
 
-class StationView(viewsets.ViewSet):
-    def retrieve(self, request, pk=None):
+    async def get(self, request, pk):
         try:
-            station = SnotelSite.objects.get(site_id=pk)
+            limit = page_limit(request, settings.HISTORY_PAGE_LIMIT, settings.HISTORY_PAGE_LIMIT_MAX)
+            start_time, end_time, after = self._window(request)
+        except InvalidPage as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        # Recent windows are served from memory; older ranges and unknown sites go to the database.
+        await hot_window_cache.aensure_fresh()
+        with profile_stage('hot_cache'):
+            cached = hot_window_cache.get(pk, start_time, end_time, after, limit + 1)
+        if cached is not None:
+            return self._page(request, pk, cached, end_time, limit)
+
+        try:
+            station = await SnotelSite.objects.aget(site_id=pk)
         except SnotelSite.DoesNotExist:
             return JsonResponse({'error': 'Station not found'}, status=404)
 
-        time_offset_hrs = int(request.query_params.get('time_offset_hrs', 24))
-        end_time = datetime.now()
-        start_time = end_time - timedelta(hours=time_offset_hrs)
+        # Ranges reaching into purged seasons read those seasons from cold storage first.
+        seasons = ArchivedSeason.objects.filter(snotel_site=station, purged=True, start__lte=end_time,
+                                                end__gt=start_time)
+        seasons = [s async for s in seasons]
+        rows = []
+        if seasons:
+            with profile_stage('cold_storage'):
+                rows = await sync_to_async(cold_storage.read)(seasons, start_time, end_time, after, limit + 1)
 
-        local_timezone = pytz.timezone('America/Denver')
-        data = SnotelData.objects.filter(snotel_site=station, timestamp__range=(start_time, end_time))
-        serializer = SnotelDataSerializer(data, many=True)
-
-        response = {
-            'station_id': station.site_id,
-            'data': [{'timestamp_station_local': d.timestamp,
+        if len(rows) <= limit:
+            data = SnotelData.objects.filter(snotel_site=station, timestamp__lte=end_time)
+            if after is None:
+                data = data.filter(timestamp__gte=start_time)
+            else:
+                data = data.filter(timestamp__gt=start_time)
+            data = data.order_by('timestamp')[:limit + 1 - len(rows)]
+            rows += [{'timestamp_station_local': d.timestamp,
                       'temp': d.temp,
-                      'snow_depth': d.snow_depth} for d in data]
-        }
+                      'snow_depth': d.snow_depth} async for d in data]
+
+        return self._page(request, station.site_id, rows, end_time, limit)
+
+
+class ForecastView(View):
+
+    async def get(self, request, pk):
+        try:
+            station = await SnotelSite.objects.select_related('forecast_gridpoint').aget(site_id=pk)
+        except SnotelSite.DoesNotExist:
+            return JsonResponse({'error': 'Station not found'}, status=404)
+
+        try:
+            gridpoint = await NwsForecastFetcher().get_site_forecast(station)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+            logger.error("An error occurred while fetching the forecast for site %s: %s", pk, str(e))
+            return JsonResponse({'error': 'Forecast unavailable'}, status=502)
+
+        with profile_stage('serialize'):
+            response = JsonResponse({
+                'station_id': station.site_id,
+                'grid': {'id': gridpoint.grid_id, 'x': gridpoint.grid_x, 'y': gridpoint.grid_y},
+                'fetched_at': gridpoint.fetched_at,
+                'expires_at': gridpoint.expires_at,
+                'periods': gridpoint.periods,
+            })
+        max_age = max(int((gridpoint.expires_at - timezone.now()).total_seconds()), 0)
+        response['Cache-Control'] = f'public, max-age={max_age}'
+        return response
+
 
-        return JsonResponse(response)
\ No newline at end of file
+class ObservationStreamView(View):
+
+    async def get(self, request):
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        response = StreamingHttpResponse(event_stream(last_event_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx-style proxies from buffering the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class SnowGridView(View):
+
+    async def get(self, request):
+        try:
+            grid = await SnowGrid.objects.defer(*SNOW_GRID_FIELDS).alatest()
+        except SnowGrid.DoesNotExist:
+            return JsonResponse({'error': 'No snow grid has been computed'}, status=404)
+
+        response = JsonResponse({
+            'computed_at': grid.computed_at,
+            'bounds': {'west': grid.west, 'south': grid.south, 'east': grid.east, 'north': grid.north},
+            'cell_deg': grid.cell_deg,
+            'width': grid.width,
+            'height': grid.height,
+            'site_count': grid.site_count,
+            'units': 'in',
+            'fields': {field: request.build_absolute_uri(reverse('snow-grid-field', args=[grid.pk, field]))
+                       for field in SNOW_GRID_FIELDS},
+        })
+        response['Cache-Control'] = 'public, max-age=60'
+        return response
+
+
+class SnowGridFieldView(View):
+
+    async def get(self, request, pk, field):
+        if field not in SNOW_GRID_FIELDS:
+            return HttpResponseNotFound()
+
+        # A grid never changes once computed, so its fields can be cached forever.
+        etag = f'"snow-grid-{pk}-{field}"'
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        else:
+            try:
+                data = bytes(await SnowGrid.objects.values_list(field, flat=True).aget(pk=pk))
+            except SnowGrid.DoesNotExist:
+                return HttpResponseNotFound()
+            accepted = parse_accept_encoding(request.headers.get('Accept-Encoding', ''))
+            if accepted.get('gzip', accepted.get('*', 0)) > 0:
+                response = HttpResponse(data, content_type='application/octet-stream')
+                response['Content-Encoding'] = 'gzip'
+            else:
+                response = HttpResponse(gzip.decompress(data), content_type='application/octet-stream')
+        response['ETag'] = etag
+        response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
@@ -0,0 +1,125 @@
+import logging
+import os
+import threading
+import time
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import resolve
+from .hot_cache import hot_window_cache
+
+
+logger = logging.getLogger('testlogger')
+
+
+class WorkerStartup:
+    """
+    How long this worker process took to become ready, for `/metrics`.
+
+    Attributes:
+        boot_seconds (float): From the worker being forked to the end of its warm-up.
+        stage_seconds (dict): Seconds spent per warm-up stage.
+        request_seconds (dict): Latency of each warm-up path on its first and second run.
+    """
+
+    def __init__(self):
+        self.boot_seconds = None
+        self.stage_seconds = {}
+        self.request_seconds = {}
+        self._lock = threading.Lock()
+
+    def render_prometheus(self):
+        """
+        Renders the startup timings in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics text, empty if the worker was not warmed up.
+        """
+        with self._lock:
+            if self.boot_seconds is None:
+                return ''
+            pid = os.getpid()
+            lines = ['# HELP funtel_worker_boot_seconds Seconds from fork until the worker was warmed up.',
+                     '# TYPE funtel_worker_boot_seconds gauge',
+                     f'funtel_worker_boot_seconds{{pid="{pid}"}} {self.boot_seconds}',
+                     '# HELP funtel_worker_warmup_stage_seconds Seconds spent per warm-up stage.',
+                     '# TYPE funtel_worker_warmup_stage_seconds gauge']
+            lines += [f'funtel_worker_warmup_stage_seconds{{pid="{pid}",stage="{stage}"}} {seconds}'
+                      for stage, seconds in self.stage_seconds.items()]
+            lines += ['# HELP funtel_worker_warmup_request_seconds Warm-up request latency, cold (run 1) and warm (run 2).',
+                      '# TYPE funtel_worker_warmup_request_seconds gauge']
+            lines += [f'funtel_worker_warmup_request_seconds{{pid="{pid}",path="{path}",run="{run}"}} {seconds}'
+                      for (path, run), seconds in self.request_seconds.items()]
+            return '\n'.join(lines) + '\n'
+
+
+worker_startup = WorkerStartup()
+
+
+def _get(path):
+    """
+    Runs a GET for `path` straight through its view.
+    """
+    host = next((host for host in settings.ALLOWED_HOSTS if not host.startswith('.') and host != '*'), 'localhost')
+    request = RequestFactory().get(path, HTTP_HOST=host)
+    match = resolve(request.path_info)
+    request.resolver_match = match
+    if iscoroutinefunction(match.func):
+        response = async_to_sync(match.func)(request, *match.args, **match.kwargs)
+    else:
+        response = match.func(request, *match.args, **match.kwargs)
+    if response.status_code >= 400:
+        logger.warning("Warm-up request to %s returned %s", path, response.status_code)
+
+
+def warm_up(started=None, keep_connections=True, notify=None):
+    """
+    Readies a freshly started worker before it accepts requests.
+
+    Opens the database connection, loads the hot window cache and runs each of
+    WARMUP_PATHS twice through its view, so the first real requests don't pay for
+    lazy imports, cold Postgres buffers or an empty cache. Failures are logged and
+    never stop the worker from starting.
+
+    Args:
+        started (float): `time.monotonic()` when the worker was forked, for the boot time.
+        keep_connections (bool): Keep the warmed connection open. Only sync workers
+            reuse it; under ASGI every request gets its own connection.
+        notify (callable): Called after each step, e.g. gunicorn's `worker.notify`, so a
+            long warm-up isn't mistaken for a hung worker.
+
+    Returns:
+        WorkerStartup: The recorded timings.
+    """
+    stages = {}
+    requests = {}
+
+    def timed(name, func, *args):
+        start = time.perf_counter()
+        try:
+            func(*args)
+        except Exception as e:
+            logger.warning("Warm-up step %s failed: %s", name, str(e))
+        if notify is not None:
+            notify()
+        return round(time.perf_counter() - start, 4)
+
+    stages['db_connect'] = timed('db_connect', connections['default'].ensure_connection)
+    stages['hot_cache'] = timed('hot_cache', hot_window_cache.ensure_fresh)
+    for path in settings.WARMUP_PATHS:
+        for run in (1, 2):
+            requests[(path, run)] = timed(path, _get, path)
+    stages['requests'] = round(sum(requests.values()), 4)
+    if not keep_connections:
+        connections.close_all()
+
+    with worker_startup._lock:
+        worker_startup.stage_seconds = stages
+        worker_startup.request_seconds = requests
+        if started is not None:
+            worker_startup.boot_seconds = round(time.monotonic() - started, 4)
+        else:
+            worker_startup.boot_seconds = round(sum(stages.values()), 4)
+    logger.info("Worker %s warmed up in %ss: %s", os.getpid(), worker_startup.boot_seconds, stages)
+    return worker_startup
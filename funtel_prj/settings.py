@@ -2,7 +2,7 @@ import os
 import secrets
 from pathlib import Path
 import dj_database_url
-from decouple import config
+from decouple import Csv, config
 
 WHITENOISE_MIMETYPES = {
     '.css': 'text/css',
@@ -27,6 +27,8 @@ else:
     ALLOWED_HOSTS = ['localhost']
 
 CORS_ORIGIN_ALLOW_ALL = True
+# Paginated endpoints point to their next page in a Link header, which the frontend reads cross-origin.
+CORS_EXPOSE_HEADERS = ['Link']
 
 # Application definition
 
@@ -40,6 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     "whitenoise.runserver_nostatic"]
 
@@ -54,7 +57,17 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
-    
+
+# Opt-in request profiling: Server-Timing headers, per-endpoint latency histograms
+# on /metrics, and cProfile dumps for a sample of slow requests.
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=False, cast=bool)
+PROFILING_SAMPLE_RATE = config('PROFILING_SAMPLE_RATE', default=0.0, cast=float)
+PROFILING_SLOW_MS = config('PROFILING_SLOW_MS', default=500, cast=int)
+PROFILING_DUMP_DIR = config('PROFILING_DUMP_DIR', default=os.path.join(BASE_DIR, 'profiles'))
+
+if PROFILING_ENABLED:
+    MIDDLEWARE.insert(0, 'datahub.middleware.ProfilingMiddleware')
+
 
 ROOT_URLCONF = 'funtel_prj.urls'
 
@@ -83,6 +96,12 @@ WSGI_APPLICATION = 'funtel_prj.wsgi.application'
 
 
 
+# Seconds a sync worker keeps its database connection between requests. ASGI workers open one per
+# request thread that is never reused, and a nonzero age would leave it open until garbage collection,
+# so persistent connections are only used with GUNICORN_WORKER_CLASS=sync.
+GUNICORN_WORKER_CLASS = config('GUNICORN_WORKER_CLASS', default='uvicorn.workers.UvicornWorker')
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=600, cast=int) if GUNICORN_WORKER_CLASS == 'sync' else 0
+
 if IS_HEROKU_APP:
     # In production on Heroku the database configuration is derived from the `DATABASE_URL`
     # environment variable by the dj-database-url package. `DATABASE_URL` will be set
@@ -91,7 +110,7 @@ if IS_HEROKU_APP:
     # https://github.com/jazzband/dj-database-url
     DATABASES = {
         "default": dj_database_url.config(
-            conn_max_age=600,
+            conn_max_age=DB_CONN_MAX_AGE,
             conn_health_checks=True,
             ssl_require=True,
         ),
@@ -107,6 +126,8 @@ else:
         "PASSWORD": "",
         "HOST": "localhost",
         "PORT": "5432",
+        "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
@@ -188,6 +209,101 @@ LOGGING = {
     }
 }
 
+# Upstream USDA report generator. Point this at a local fake (see
+# datahub/scripts/fake_upstream.py) to run ingest without network access.
+SNOTEL_REPORT_BASE_URL = config('SNOTEL_REPORT_BASE_URL',
+                                default='https://wcc.sc.egov.usda.gov/reportGenerator/view_csv')
+
+# Upstream response validators and content hashes are cached in the database (UpstreamResponse) so
+# unchanged reports skip parsing and merging on every dyno.
+SNOTEL_RESPONSE_CACHE_MAX_AGE_SECONDS = config('SNOTEL_RESPONSE_CACHE_MAX_AGE_SECONDS', default=2 * 24 * 3600, cast=int)
+SNOTEL_SITE_LIST_TTL_SECONDS = config('SNOTEL_SITE_LIST_TTL_SECONDS', default=24 * 3600, cast=int)
+
+# CSV parsing during ingest runs in a 'process' or 'thread' pool ('inline' uses the event loop's
+# default thread pool); 0 workers means one per CPU. Parsed sites are inserted in batches of about
+# SNOTEL_INSERT_BATCH_ROWS rows while the remaining sites download.
+SNOTEL_PARSE_EXECUTOR = config('SNOTEL_PARSE_EXECUTOR', default='process')
+SNOTEL_PARSE_WORKERS = config('SNOTEL_PARSE_WORKERS', default=0, cast=int)
+SNOTEL_INSERT_BATCH_ROWS = config('SNOTEL_INSERT_BATCH_ROWS', default=50000, cast=int)
+
+# Each fetcher (one per ingest shard) keeps at most SNOTEL_HTTP_CONNECTIONS upstream connections open.
+# Ingest covers SNOTEL_INGEST_STATES (comma separated, or 'all'); with SNOTEL_INGEST_SHARDS above 1 the
+# sites are split by whole state or network (SNOTEL_SHARD_BY) across that many worker processes.
+SNOTEL_HTTP_CONNECTIONS = config('SNOTEL_HTTP_CONNECTIONS', default=16, cast=int)
+SNOTEL_INGEST_STATES = config('SNOTEL_INGEST_STATES', default='CO')
+SNOTEL_INGEST_SHARDS = config('SNOTEL_INGEST_SHARDS', default=1, cast=int)
+SNOTEL_SHARD_BY = config('SNOTEL_SHARD_BY', default='state')
+
+# Station requests within the last HOT_CACHE_WINDOW_DAYS are served from an in-process cache, reloaded
+# when a new ingest run is seen (checked at most every HOT_CACHE_CHECK_SECONDS).
+HOT_CACHE_WINDOW_DAYS = config('HOT_CACHE_WINDOW_DAYS', default=7, cast=int)
+HOT_CACHE_CHECK_SECONDS = config('HOT_CACHE_CHECK_SECONDS', default=60, cast=float)
+
+# Closed seasons (water years) are archived as Parquet in ArchivedSeason by the archive_seasons runscript,
+# leaving the COLD_STORAGE_KEEP_SEASONS most recent closed seasons alone. Nothing moves unless
+# COLD_STORAGE_PURGE (or the runscript's 'purge' argument) is set: without it the archive is only a copy
+# and the rows stay in SnotelData.
+COLD_STORAGE_KEEP_SEASONS = config('COLD_STORAGE_KEEP_SEASONS', default=1, cast=int)
+COLD_STORAGE_PURGE = config('COLD_STORAGE_PURGE', default=False, cast=bool)
+
+# Keyset pagination of the station list and station history; clients may ask for up to the _MAX with ?limit=.
+STATIONS_PAGE_LIMIT = config('STATIONS_PAGE_LIMIT', default=500, cast=int)
+STATIONS_PAGE_LIMIT_MAX = config('STATIONS_PAGE_LIMIT_MAX', default=1000, cast=int)
+HISTORY_PAGE_LIMIT = config('HISTORY_PAGE_LIMIT', default=1000, cast=int)
+HISTORY_PAGE_LIMIT_MAX = config('HISTORY_PAGE_LIMIT_MAX', default=5000, cast=int)
+
+# /api/stations/search/ returns STATION_SEARCH_LIMIT matches by default, up to STATION_SEARCH_LIMIT_MAX with ?limit=.
+STATION_SEARCH_LIMIT = config('STATION_SEARCH_LIMIT', default=10, cast=int)
+STATION_SEARCH_LIMIT_MAX = config('STATION_SEARCH_LIMIT_MAX', default=50, cast=int)
+
+# New observations are announced on this PostgreSQL NOTIFY channel and pushed to clients of the
+# /api/stream/observations/ server-sent event stream. Streams send a keepalive comment every
+# SSE_KEEPALIVE_SECONDS and end after SSE_MAX_STREAM_SECONDS, when clients reconnect after SSE_RETRY_MS.
+SNOTEL_NOTIFY_CHANNEL = config('SNOTEL_NOTIFY_CHANNEL', default='snotel_observations')
+SSE_KEEPALIVE_SECONDS = config('SSE_KEEPALIVE_SECONDS', default=15, cast=float)
+SSE_MAX_STREAM_SECONDS = config('SSE_MAX_STREAM_SECONDS', default=600, cast=float)
+SSE_RETRY_MS = config('SSE_RETRY_MS', default=5000, cast=int)
+
+# After an ingest that inserts rows, the latest snow depths and 24h gains are interpolated (inverse distance
+# weighting) onto a SNOW_GRID_CELL_DEG grid for map overlays. Cells further than SNOW_GRID_MAX_DISTANCE_KM from
+# every site are left empty, sites without a reading in SNOW_GRID_MAX_AGE_HOURS are skipped and the latest
+# SNOW_GRID_KEEP grids are kept.
+SNOW_GRID_ENABLED = config('SNOW_GRID_ENABLED', default=True, cast=bool)
+SNOW_GRID_CELL_DEG = config('SNOW_GRID_CELL_DEG', default=0.02, cast=float)
+SNOW_GRID_IDW_POWER = config('SNOW_GRID_IDW_POWER', default=2.0, cast=float)
+SNOW_GRID_MAX_DISTANCE_KM = config('SNOW_GRID_MAX_DISTANCE_KM', default=40.0, cast=float)
+SNOW_GRID_MAX_AGE_HOURS = config('SNOW_GRID_MAX_AGE_HOURS', default=48, cast=int)
+SNOW_GRID_KEEP = config('SNOW_GRID_KEEP', default=5, cast=int)
+
+# Alert rules are checked against each ingest batch's new rows; alerts for observations older than
+# ALERT_MAX_AGE_HOURS are not sent. The deliver_alerts runscript posts queued alerts to their webhooks,
+# polling every ALERT_DELIVERY_POLL_SECONDS and giving up after ALERT_DELIVERY_MAX_ATTEMPTS with backoff.
+ALERTS_ENABLED = config('ALERTS_ENABLED', default=True, cast=bool)
+ALERT_MAX_AGE_HOURS = config('ALERT_MAX_AGE_HOURS', default=6, cast=int)
+ALERT_DELIVERY_POLL_SECONDS = config('ALERT_DELIVERY_POLL_SECONDS', default=10, cast=float)
+ALERT_DELIVERY_BATCH = config('ALERT_DELIVERY_BATCH', default=50, cast=int)
+ALERT_DELIVERY_MAX_ATTEMPTS = config('ALERT_DELIVERY_MAX_ATTEMPTS', default=5, cast=int)
+ALERT_WEBHOOK_TIMEOUT_SECONDS = config('ALERT_WEBHOOK_TIMEOUT_SECONDS', default=10, cast=float)
+
+# Under gunicorn (see gunicorn.conf.py) each worker opens its database connection, loads the hot window cache
+# and requests WARMUP_PATHS twice before taking traffic; startup timings are exported on /metrics.
+WARMUP_ENABLED = config('WARMUP_ENABLED', default=True, cast=bool)
+WARMUP_PATHS = config('WARMUP_PATHS', default='/api/stations/,/api/station/SNOTEL:335_CO_SNTL/,/api/snow-grid/', cast=Csv())
+
+# Unfiltered admin changelists show PostgreSQL's row estimate instead of a COUNT(*) above this many rows.
+ADMIN_ESTIMATED_COUNT_THRESHOLD = config('ADMIN_ESTIMATED_COUNT_THRESHOLD', default=100000, cast=int)
+
+# NWS API used for site forecasts. The API asks clients to identify themselves in the User-Agent.
+NWS_API_BASE_URL = config('NWS_API_BASE_URL', default='https://api.weather.gov')
+NWS_USER_AGENT = config('NWS_USER_AGENT', default='(funtel.herokuapp.com, funtel)')
+# Total time a site page's forecast request may wait on the NWS API before a cached forecast is served.
+NWS_REQUEST_TIMEOUT_SECONDS = config('NWS_REQUEST_TIMEOUT_SECONDS', default=8, cast=float)
+# Used when an NWS response carries no caching headers; hourly forecasts update about once an hour.
+NWS_FORECAST_TTL_SECONDS = config('NWS_FORECAST_TTL_SECONDS', default=3600, cast=int)
+
+# Where `runscript benchmark` stores its results for comparison between commits.
+BENCHMARK_RESULTS_DIR = config('BENCHMARK_RESULTS_DIR', default=os.path.join(BASE_DIR, 'benchmarks'))
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
 
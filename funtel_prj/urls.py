@@ -1,7 +1,6 @@
 from django.contrib import admin
-from django.urls import path, include, re_path
-from datahub.views import AllStationsView, StationView
-from rest_framework import routers
+from django.urls import path, re_path
+from datahub.views import AllStationsView, StationSearchView, StationView, ForecastView, ObservationStreamView, SnowGridView, SnowGridFieldView, Metrics, Assets
 from django.shortcuts import render
 from django.views.static import serve
 from django.conf import settings
@@ -17,14 +16,17 @@ def render_react(request):
     return rr
 
 
-router = routers.DefaultRouter()
-
-router.register(r'stations', AllStationsView, 'stations')
-router.register(r'station', StationView, 'station')
-
 urlpatterns = [
      path('admin/', admin.site.urls),
-     path('api/', include(router.urls)),
+     path('api/stations/', AllStationsView.as_view(), name='stations-list'),
+     path('api/stations/search/', StationSearchView.as_view(), name='stations-search'),
+     path('api/station/<str:pk>/', StationView.as_view(), name='station-detail'),
+     path('api/station/<str:pk>/forecast/', ForecastView.as_view(), name='station-forecast'),
+     path('api/stream/observations/', ObservationStreamView.as_view(), name='observation-stream'),
+     path('api/snow-grid/', SnowGridView.as_view(), name='snow-grid'),
+     path('api/snow-grid/<int:pk>/<str:field>.f32', SnowGridFieldView.as_view(), name='snow-grid-field'),
+     path('metrics', Metrics.as_view()),
+     path('assets/<path:filename>', Assets.as_view()),
      re_path(r"^$", render_react),
      re_path(r'^static/(?P<path>.*)$',
              serve, {'document_root': os.path.join(settings.BASE_DIR,
@@ -0,0 +1,39 @@
+"""
+Gunicorn config for funtel_prj.
+
+Serves the ASGI application with uvicorn workers so async views can wait on the
+database without pinning a worker. Set GUNICORN_WORKER_CLASS=sync and run
+`gunicorn funtel_prj.wsgi` to get the old sync-worker behaviour, e.g. when
+comparing throughput with `runscript loadtest`.
+
+The app is imported once in the master and forked (GUNICORN_PRELOAD), and each
+worker warms up before it accepts requests (WARMUP_ENABLED, see
+datahub.warmup), so first requests after a deploy or dyno restart run at
+steady-state latency. Preloading means code changes need a full restart rather
+than a HUP.
+"""
+import time
+# Imported as a module: gunicorn would read a top-level `config` as its own --config setting.
+import decouple
+
+worker_class = decouple.config('GUNICORN_WORKER_CLASS', default='uvicorn.workers.UvicornWorker')
+# Heroku sets WEB_CONCURRENCY from the dyno size.
+workers = decouple.config('WEB_CONCURRENCY', default=2, cast=int)
+timeout = decouple.config('GUNICORN_TIMEOUT', default=30, cast=int)
+keepalive = 5
+preload_app = decouple.config('GUNICORN_PRELOAD', default=True, cast=bool)
+
+
+def post_fork(server, worker):
+    worker.forked_at = time.monotonic()
+
+
+def post_worker_init(worker):
+    from django.conf import settings
+
+    if not settings.WARMUP_ENABLED:
+        return
+    from datahub.warmup import warm_up
+
+    # Only sync workers handle requests on the thread that warmed the connection.
+    warm_up(started=worker.forked_at, keep_connections=worker_class == 'sync', notify=worker.notify)
@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { StaticMap, MapContext, NavigationControl } from 'react-map-gl';
-import DeckGL, { ScatterplotLayer } from 'deck.gl';
+import DeckGL, { BitmapLayer, ScatterplotLayer } from 'deck.gl';
 import 'mapbox-gl/dist/mapbox-gl.css';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
@@ -26,17 +26,83 @@ const colorScale = [
   [100, [0, 85, 255]]
 ];
 
+const depthColor = (depth) => {
+  const scaledValue = (depth / 60) * 100;
+  const [value1, color1] = colorScale.find(([value]) => value >= scaledValue) || [];
+  const [value0, color0] = colorScale.find(([value]) => value < scaledValue) || [];
+  if (value1 !== undefined && value0 !== undefined) {
+    const t = (scaledValue - value0) / (value1 - value0);
+    const color = color0.map((c, index) => Math.round((1 - t) * c + t * color1[index]));
+    return color;
+  }
+  return [88,0,0]; // Default
+};
+
+// Paints the precomputed snow depth grid (float32, north row first, NaN where empty) onto a canvas.
+const gridImage = (grid, values) => {
+  const canvas = document.createElement('canvas');
+  canvas.width = grid.width;
+  canvas.height = grid.height;
+  const context = canvas.getContext('2d');
+  const image = context.createImageData(grid.width, grid.height);
+  values.forEach((value, i) => {
+    if (!Number.isNaN(value)) {
+      image.data.set([...depthColor(value), 140], i * 4);
+    }
+  });
+  context.putImageData(image, 0, 0);
+  return canvas;
+};
+
+// /api/stations/ is paginated: follow each page's `Link: <url>; rel="next"` header until the last page.
+const nextLink = (header) => {
+  const match = /<([^>]+)>;\s*rel="next"/.exec(header || '');
+  return match ? match[1] : null;
+};
+
+const fetchAllStations = async () => {
+  let stations = [];
+  let url = `${process.env.REACT_APP_HOST_BASE}/api/stations/`;
+  while (url) {
+    const response = await axios.get(url);
+    stations = stations.concat(response.data);
+    url = nextLink(response.headers.link);
+  }
+  return stations;
+};
+
 const MapComponent = () => {
   const [stationData, setStationData] = useState([]);
+  const [snowGrid, setSnowGrid] = useState(null);
   const [hoveredObject, setHoveredObject] = useState(null);
   const [hoveredPosition, setHoveredPosition] = useState({ x: 0, y: 0 });
 
   useEffect(() => {
-    axios.get(`${process.env.REACT_APP_HOST_BASE}/api/stations/`)
-      .then((response) => {
-        setStationData(response.data);
+    fetchAllStations()
+      .then((stations) => {
+        setStationData(stations);
       })
       .catch((error) => console.error('Error fetching station data:', error));
+
+    axios.get(`${process.env.REACT_APP_HOST_BASE}/api/snow-grid/`)
+      .then(async ({ data: grid }) => {
+        const response = await axios.get(grid.fields.snow_depth, { responseType: 'arraybuffer' });
+        const { west, south, east, north } = grid.bounds;
+        setSnowGrid({ image: gridImage(grid, new Float32Array(response.data)), bounds: [west, south, east, north] });
+      })
+      .catch((error) => console.error('Error fetching snow grid:', error));
+  }, []);
+
+  useEffect(() => {
+    // Apply the latest readings of sites that got new observations instead of refetching every station.
+    const source = new EventSource(`${process.env.REACT_APP_HOST_BASE}/api/stream/observations/`);
+    source.addEventListener('observations', (event) => {
+      const updates = Object.fromEntries(JSON.parse(event.data).sites.map((site) => [site.site_id, site]));
+      setStationData((stations) => stations.map((station) => (
+        updates[station.site_id] ? { ...station, ...updates[station.site_id] } : station
+      )));
+    });
+    return () => source.close();
   }, []);
 
   const navigate = useNavigate();
@@ -56,17 +122,7 @@ const MapComponent = () => {
     id: 'scatterplot-layer',
     data: filteredData,
     getPosition: (d) => [d.lon, d.lat],
-    getFillColor: (d) => {
-      const scaledValue = (d.latest_snow_depth / 60) * 100;
-      const [value1, color1] = colorScale.find(([value]) => value >= scaledValue) || [];
-      const [value0, color0] = colorScale.find(([value]) => value < scaledValue) || [];
-      if (value1 !== undefined && value0 !== undefined) {
-        const t = (scaledValue - value0) / (value1 - value0);
-        const color = color0.map((c, index) => Math.round((1 - t) * c + t * color1[index]));
-        return color;
-      }
-      return [88,0,0]; // Default
-    },
+    getFillColor: (d) => depthColor(d.latest_snow_depth),
     getLineColor: [0, 0, 0], // Black border color
     lineWidthMinPixels: 2, // Border line width
     pickable: true,
@@ -83,13 +139,19 @@ const MapComponent = () => {
     }
   });
 
+  const snowGridLayer = snowGrid && new BitmapLayer({
+    id: 'snow-grid-layer',
+    image: snowGrid.image,
+    bounds: snowGrid.bounds,
+  });
+
   return (
     <div>
        
       <DeckGL
         initialViewState={INITIAL_VIEW_STATE}
         controller={true}
-        layers={[scatterplotLayer]}
+        layers={[snowGridLayer, scatterplotLayer].filter(Boolean)}
         ContextProvider={MapContext.Provider}
       >
         <StaticMap 
@@ -15,16 +15,27 @@ const SitePage = () => {
   const [lon, setLon] = useState('');
 
   useEffect(() => {
-    axios.get(`${process.env.REACT_APP_HOST_BASE}/api/station/${snotel_site_id}/?time_offset_hrs=96`)
-      .then((response) => {
-        setData(response.data.data);
-      })
-      .catch((error) => console.error('Error fetching data:', error));
+    const fetchData = () => {
+      axios.get(`${process.env.REACT_APP_HOST_BASE}/api/station/${snotel_site_id}/?time_offset_hrs=96`)
+        .then((response) => {
+          setData(response.data.data);
+        })
+        .catch((error) => console.error('Error fetching data:', error));
+    };
+    fetchData();
+
+    // Refetch only when this site gets new observations.
+    const source = new EventSource(`${process.env.REACT_APP_HOST_BASE}/api/stream/observations/`);
+    source.addEventListener('observations', (event) => {
+      if (JSON.parse(event.data).sites.some((site) => site.site_id === snotel_site_id)) {
+        fetchData();
+      }
+    });
 
-    axios.get(`${process.env.REACT_APP_HOST_BASE}/api/stations/`)
+    // An exact site ID is always the first search match.
+    axios.get(`${process.env.REACT_APP_HOST_BASE}/api/stations/search/`, { params: { q: snotel_site_id, limit: 1 } })
       .then((response) => {
-        const stationsData = response.data;
-        const station = stationsData.find((station) => station.site_id === snotel_site_id);
+        const station = response.data.find((station) => station.site_id === snotel_site_id);
         if (station) {
           setStationName(station.name); 
           const { lat, lon } = station;
@@ -32,6 +43,8 @@ const SitePage = () => {
           setLon(lon);
         }
       });
+
+    return () => source.close();
   }, [snotel_site_id]);
 
   const getXAxisTickCount = () => {
@@ -219,7 +232,7 @@ const SitePage = () => {
             >
               Weather near {stationName} Snotel
             </Typography>
-            {lat && lon && <Weather lat={lat} lon={lon} />}
+            <Weather siteId={snotel_site_id} />
           </div>
         </div>
       </Container>
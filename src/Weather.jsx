@@ -2,21 +2,17 @@ import React, { useEffect, useState } from 'react';
 import { VictoryChart, VictoryLine, VictoryBar, VictoryPolarAxis, VictoryStack } from 'victory';
 import { CircularProgress } from '@mui/material';
 
-const WeatherForecast = ({ lat, lon }) => {
+const WeatherForecast = ({ siteId }) => {
   const [forecastData, setForecastData] = useState(null);
 
   useEffect(() => {
     const fetchForecastData = async () => {
       try {
-        const pointsResponse = await fetch(`https://api.weather.gov/points/${lat},${lon}`);
-        const pointsData = await pointsResponse.json();
-        const forecastHourlyUrl = pointsData.properties.forecastHourly;
+        // The backend caches the NWS gridpoint and hourly forecast per site.
+        const forecastResponse = await fetch(`${process.env.REACT_APP_HOST_BASE}/api/station/${siteId}/forecast/`);
+        const forecast = await forecastResponse.json();
 
-        const forecastHourlyResponse = await fetch(forecastHourlyUrl);
-        const forecastHourlyData = await forecastHourlyResponse.json();
-        const periods = forecastHourlyData.properties.periods;
-
-        setForecastData(periods);
+        setForecastData(forecast.periods || []);
       } catch (error) {
         console.error('Error fetching weather forecast data:', error);
         setForecastData([]); // Set an empty array in case of error
@@ -24,7 +20,7 @@ const WeatherForecast = ({ lat, lon }) => {
     };
 
     fetchForecastData();
-  }, [lat, lon]);
+  }, [siteId]);
 
   if (!forecastData) {
     return <CircularProgress />;